@@ -0,0 +1,348 @@
+"""
+Offline benchmarks of the hot paths of the bot: prefix resolution, ranking
+sort and render, the duplicate checks of the ranking list, the memory and the
+lookups of the in-memory ranking lists and the latency of the whole commands
+against the local Riot API stand-in. Results are printed as JSON and can be
+compared with the baseline stored in the repository:
+
+    python benchmark.py --compare
+    python benchmark.py --only ranking,roster --output results.json
+"""
+import argparse
+import asyncio
+import gc
+import json
+import os
+import platform
+import random
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from contextlib import contextmanager
+from types import SimpleNamespace
+
+import mock_riot
+import renderer
+import roster
+from database import Database
+from guild_config import GuildConfigCache
+from leaderboard import LadderEntry, Leaderboard
+from migrations import run_migrations
+from riot_api import RiotClient
+from snapshots import build_snapshot
+
+BASELINE_PATH = os.path.join('benchmarks', 'baseline.json')
+
+# Result slower or bigger than the baseline by this factor is reported as a
+# regression, compared are the median times and the memory
+REGRESSION_THRESHOLD = 1.25
+COMPARED_VALUES = (('median_ms', 'ms'), ('bytes', 'B'))
+
+# Results whose single run took less than this are not compared, they measure
+# the timer and the scheduler more than the code. Fast calls are timed in
+# batches to stay above it
+NOISE_FLOOR_MS = 0.1
+
+PREFIX_GUILDS = 10000
+PREFIX_MESSAGES = 200000
+RANKING_SIZES = (10, 100, 1000)
+# Medians of a handful of runs move by more than the regression threshold
+RANKING_RUNS = 100
+ROSTER_SIZES = (1000, 10000, 100000)
+COMMAND_PLAYERS = 100
+COMMAND_RUNS = 20
+MOCK_PORT = 8765
+MOCK_LATENCY = 'lognormal:30:0.3'
+
+
+def summary(samples, batch=1):
+    """Returns the statistics of the measured durations in milliseconds,
+    every sample is the duration of the batch of calls"""
+    samples = sorted(sample / batch for sample in samples)
+    return {
+        'runs': len(samples),
+        'batch': batch,
+        'min_ms': round(samples[0] * 1000, 4),
+        'median_ms': round(statistics.median(samples) * 1000, 4),
+        'p95_ms': round(samples[min(len(samples) - 1, int(len(samples) * 0.95))] * 1000, 4),
+    }
+
+
+@contextmanager
+def gc_paused():
+    """Keeps the garbage collector out of the measured runs, the same as
+    timeit does, so a collection doesn't land in a random sample"""
+    gc.collect()
+    gc.disable()
+    try:
+        yield
+    finally:
+        gc.enable()
+
+
+def measure(function, runs, batch=1):
+    samples = []
+    with gc_paused():
+        for _ in range(runs):
+            start = time.perf_counter()
+            for _ in range(batch):
+                function()
+            samples.append(time.perf_counter() - start)
+    return summary(samples, batch)
+
+
+async def measure_async(function, runs, batch=1):
+    samples = []
+    with gc_paused():
+        for _ in range(runs):
+            start = time.perf_counter()
+            for _ in range(batch):
+                await function()
+            samples.append(time.perf_counter() - start)
+    return summary(samples, batch)
+
+
+def ladder_entries(population, region):
+    return [LadderEntry.from_league_entry(summoner['name'], entry, region)
+            for summoner, entries in population[region] for entry in entries
+            if entry['queueType'] == 'RANKED_SOLO_5x5']
+
+
+def bench_prefix(workdir):
+    """Prefix resolution of the messages coming from many discord servers,
+    done the same way as get_prefix of the bot"""
+    db = Database(os.path.join(workdir, 'prefix.db'))
+    db.run_sync(run_migrations)
+    db.run_sync(lambda conn: conn.executemany("INSERT INTO server_config VALUES (?, 'eun1', '$')",
+                                              [(str(guild_id),) for guild_id in range(PREFIX_GUILDS)]))
+    guild_configs = GuildConfigCache(db)
+    db.run_sync(guild_configs.load)
+
+    rng = random.Random(0)
+    messages = [SimpleNamespace(guild=SimpleNamespace(id=rng.randrange(PREFIX_GUILDS)))
+                for _ in range(PREFIX_MESSAGES)]
+
+    def resolve_all():
+        for message in messages:
+            guild_configs.prefix(str(message.guild.id))
+
+    result = measure(resolve_all, 15)
+    result['messages_per_second'] = round(PREFIX_MESSAGES / (result['median_ms'] / 1000))
+    return {'prefix': result}
+
+
+def bench_ranking(workdir):
+    """Sorting of the downloaded entries into the leaderboard and rendering of
+    the pages, both from scratch and after a few entries changed"""
+    results = {}
+    for size in RANKING_SIZES:
+        population = mock_riot.synthetic_population(int(size / mock_riot.SOLO_RANKED_SHARE) + 50,
+                                                    ('eun1',), seed=size)
+        entries = ladder_entries(population, 'eun1')[:size]
+
+        def build():
+            board = Leaderboard()
+            board.replace_all(entries)
+            pages = renderer.paginate(renderer.ranking_rows(board.top()))
+            renderer.build_embeds(pages, 'Ranking')
+
+        board = Leaderboard()
+        board.replace_all(entries)
+        rng = random.Random(size)
+
+        def update():
+            changed = list(entries)
+            for index in rng.sample(range(len(changed)), max(1, size // 100)):
+                entry = changed[index]
+                changed[index] = LadderEntry(entry.summoner_name, entry.riot_id, entry.tier, entry.rank,
+                                             entry.league_points + rng.randint(1, 20), entry.wins + 1,
+                                             entry.losses, entry.region)
+            board.replace_all(changed)
+
+        batch = max(1, 1000 // size)
+        results[f'ranking_build_{size}'] = measure(build, RANKING_RUNS, batch)
+        results[f'ranking_update_{size}'] = measure(update, RANKING_RUNS, batch)
+    return results
+
+
+def bench_roster(workdir):
+    """Duplicate checks of add_player and del_player against large rosters"""
+    results = {}
+    for size in ROSTER_SIZES:
+        conn = sqlite3.connect(os.path.join(workdir, f'roster_{size}.db'))
+        run_migrations(conn)
+        with conn:
+            conn.executemany("INSERT INTO players (riot_id, riot_region, summoner_name) VALUES (?, 'eun1', ?)",
+                             [(f'id{number}', f'Player {number}') for number in range(size)])
+            conn.executemany("INSERT INTO guild_players VALUES (?, ?)",
+                             [(str(number % 100), number + 1) for number in range(size)])
+
+        rng = random.Random(size)
+
+        def add_duplicate():
+            number = rng.randrange(size)
+            with conn:
+                roster.add_player(conn, str(number % 100), f'Player {number}', f'id{number}', 'eun1')
+
+        def delete_missing():
+            with conn:
+                roster.delete_player(conn, str(rng.randrange(100)), f'Nobody {rng.randrange(size)}', 'eun1')
+
+        results[f'roster_add_duplicate_{size}'] = measure(add_duplicate, 25, 20)
+        results[f'roster_delete_missing_{size}'] = measure(delete_missing, 25, 100)
+
+        # Memory still held after the load, the rows read from the database
+        # are already freed
+        tracemalloc.start()
+        store = roster.RosterStore(None)
+        store.load(conn)
+        used = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+
+        def find_player():
+            number = rng.randrange(size)
+            store.find(str(number % 100), f'PLAYER {number}')
+
+        results[f'roster_store_bytes_per_player_{size}'] = {'bytes': round(used / size)}
+        results[f'roster_store_load_{size}'] = measure(lambda: roster.RosterStore(None).load(conn),
+                                                       max(5, 200000 // size))
+        results[f'roster_store_find_{size}'] = measure(find_player, 25, 500)
+        conn.close()
+    return results
+
+
+async def _bench_commands(workdir):
+    population = mock_riot.synthetic_population(COMMAND_PLAYERS, ('eun1',), seed=1)
+    summoners = [summoner for summoner, _ in population['eun1']]
+    mock = mock_riot.MockRiotApi(population, latency=MOCK_LATENCY, app_limits='100000:1',
+                                 method_limits={'summoner-v4': '100000:1', 'league-v4': '100000:1'})
+    runner = await mock_riot.start_server(mock, port=MOCK_PORT)
+    riot = RiotClient('benchmark', host=f'http://127.0.0.1:{MOCK_PORT}/{{region}}')
+    db = Database(os.path.join(workdir, 'commands.db'))
+    db.run_sync(run_migrations)
+    db.start()
+
+    guild_id = '1'
+    names = iter(summoner['name'] for summoner in summoners)
+    store = roster.RosterStore(db)
+    db.run_sync(store.load)
+
+    async def add_player():
+        summoner_data = await riot.summoner_by_name('eun1', next(names))
+        await store.add(guild_id, summoner_data['name'], summoner_data['id'], 'eun1')
+
+    async def ranking():
+        # Every run downloads the entries again, the same as the first
+        # ranking after the cache expired
+        players = store.players(guild_id)
+        for player in players:
+            riot.league_cache.invalidate(('eun1', player.riot_id))
+        semaphore = asyncio.Semaphore(8)
+
+        async def fetch(player):
+            async with semaphore:
+                return await riot.league_entries('eun1', player.riot_id)
+
+        snapshot = await build_snapshot(players, fetch)
+        board = Leaderboard()
+        board.replace_all(snapshot.queues['solo'])
+        renderer.build_embeds(renderer.paginate(renderer.ranking_rows(board.top())), 'Ranking')
+
+    async def show_players():
+        # Everything but sending the embeds to Discord
+        players = store.players(guild_id)
+        renderer.build_embeds(renderer.paginate(renderer.player_rows(players)), 'List of players')
+
+    try:
+        results = {'command_add_player': await measure_async(add_player, COMMAND_PLAYERS)}
+        results[f'command_ranking_{COMMAND_PLAYERS}'] = await measure_async(ranking, COMMAND_RUNS)
+        results[f'command_show_players_{COMMAND_PLAYERS}'] = await measure_async(show_players, 100, 10)
+        results['mock_requests'] = dict(mock.stats)
+    finally:
+        await riot.close()
+        await runner.cleanup()
+        db.close()
+    return results
+
+
+def bench_commands(workdir):
+    """Latency of the whole command paths against the local Riot API
+    stand-in with the latency of the real servers"""
+    return asyncio.run(_bench_commands(workdir))
+
+
+BENCHMARKS = {
+    'prefix': bench_prefix,
+    'ranking': bench_ranking,
+    'roster': bench_roster,
+    'commands': bench_commands,
+}
+
+
+def compare(results, baseline, threshold=REGRESSION_THRESHOLD):
+    """Returns the regressions of the results against the baseline. Times of
+    the runs shorter than NOISE_FLOOR_MS are skipped
+
+    Returns:
+        list: (name, baseline value, current value) of the slower or bigger
+        results
+    """
+    regressions = []
+    for name, result in results.items():
+        previous = baseline.get(name)
+        if not previous:
+            continue
+        for key, unit in COMPARED_VALUES:
+            if key not in result or key not in previous:
+                continue
+            if unit == 'ms' and previous[key] * previous.get('batch', 1) < NOISE_FLOOR_MS:
+                continue
+            ratio = result[key] / previous[key] if previous[key] else 1
+            print(f'{name}: {previous[key]}{unit} -> {result[key]}{unit} ({ratio:.2f}x)', file=sys.stderr)
+            if ratio > threshold:
+                regressions.append((name, f'{previous[key]}{unit}', f'{result[key]}{unit}'))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Offline benchmarks of the bot hot paths')
+    parser.add_argument('--only', help='comma separated benchmarks: ' + ', '.join(BENCHMARKS))
+    parser.add_argument('--output', help='file the JSON results are written to, ex. the new baseline')
+    parser.add_argument('--compare', nargs='?', const=BASELINE_PATH, help='baseline the results are compared with')
+    args = parser.parse_args()
+
+    names = args.only.split(',') if args.only else list(BENCHMARKS)
+    results = {}
+    with tempfile.TemporaryDirectory() as workdir:
+        for name in names:
+            print(f'Running {name}', file=sys.stderr)
+            results.update(BENCHMARKS[name](workdir))
+
+    report = {
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'sqlite': sqlite3.sqlite_version,
+        'results': results,
+    }
+    print(json.dumps(report, indent=2))
+
+    if args.output:
+        with open(args.output, 'w') as output:
+            json.dump(report, output, indent=2)
+            output.write('\n')
+
+    if args.compare:
+        with open(args.compare) as baseline_file:
+            baseline = json.load(baseline_file)['results']
+        regressions = compare(results, baseline)
+        if regressions:
+            for name, previous, current in regressions:
+                print(f'Regression in {name}: {previous} -> {current}', file=sys.stderr)
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,92 @@
+"""
+Process wide cache for the Riot API responses. Entries expire after the TTL,
+the least recently used entries are evicted when the cache is full and
+concurrent requests for the same key share a single outbound call.
+"""
+import asyncio
+import time
+from collections import OrderedDict
+
+
+class TTLCache:
+    """Class responsible for keeping the downloaded data for a limited time
+
+    Parameters:
+        ttl: float: seconds after which the entry is considered outdated
+        maxsize: int: maximum amount of the entries kept in the cache
+    """
+    def __init__(self, ttl, maxsize):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self._pending = {}
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+
+    def get(self, key):
+        """Returns the cached value or None when it's missing or outdated"""
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry[0] <= time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return entry[1]
+
+    def set(self, key, value):
+        self._entries[key] = (time.monotonic() + self.ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, key):
+        self._entries.pop(key, None)
+
+    async def get_or_load(self, key, loader):
+        """Returns the cached value, or awaits the loader to get it. When the
+        same key is already being loaded the caller waits for that call
+        instead of starting a new one
+
+        Parameters:
+            key: hashable: cache key
+            loader: callable: coroutine function returning the fresh value
+
+        Returns:
+            object: cached or freshly loaded value
+        """
+        value = self.get(key)
+        if value is not None:
+            self.hits += 1
+            return value
+
+        pending = self._pending.get(key)
+        if pending is not None:
+            self.coalesced += 1
+            return await asyncio.shield(pending)
+
+        self.misses += 1
+        future = asyncio.get_event_loop().create_future()
+        self._pending[key] = future
+        try:
+            value = await loader()
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as err:
+            future.set_exception(err)
+            # Nobody might be waiting, mark the exception as retrieved
+            future.exception()
+            raise
+        else:
+            self.set(key, value)
+            future.set_result(value)
+            return value
+        finally:
+            del self._pending[key]
+
+    def stats(self):
+        """Returns the counters used for tuning the TTL"""
+        return {'size': len(self._entries), 'hits': self.hits,
+                'misses': self.misses, 'coalesced': self.coalesced}
@@ -5,6 +5,9 @@ import discord
 
 from discord.ext import commands
 
+import metrics
+import shards
+
 
 def is_it_owner(ctx):
     """Method for returning the bot owner ID
@@ -26,15 +29,6 @@ class Example(commands.Cog):
         """"""
         self.client = client
 
-    # Events
-    @commands.Cog.listener()
-    async def on_ready(self):
-        """When loaded displays the message
-
-        :return: printing console message for notify
-        """
-        print('example cogs loaded.')
-
     # Commands
     @commands.command()
     async def pong(self, ctx):
@@ -47,6 +41,149 @@ class Example(commands.Cog):
         """
         await ctx.send('Pong!')
 
+    @commands.command(aliases=['cachestats'])
+    @commands.check(is_it_owner)
+    async def cache_stats(self, ctx):
+        """Command responsible for showing the Riot API cache counters
+
+        :param ctx: object: A command must always have at least one parameter
+        ctx, which is the Context as the first one
+        :return: returns the message send by the bot
+        """
+        embed = discord.Embed(title='Riot API cache', color=0x0080FF)
+        for name, stats in self.client.riot.cache_stats().items():
+            embed.add_field(name=name, value=f"Size: {stats['size']}\n"
+                                             f"Hits: {stats['hits']}\n"
+                                             f"Misses: {stats['misses']}\n"
+                                             f"Coalesced: {stats['coalesced']}")
+        await ctx.send(embed=embed)
+
+    @commands.command()
+    @commands.check(is_it_owner)
+    async def stats(self, ctx):
+        """Command responsible for showing the runtime metrics of the bot
+
+        :param ctx: object: A command must always have at least one parameter
+        ctx, which is the Context as the first one
+        :return: returns the message send by the bot
+        """
+        await self.client.collect_metrics()
+        registry = metrics.registry.metrics
+
+        players = registry['kayn_players'].values
+        embed = discord.Embed(title='Bot statistics', color=0x0080FF)
+        embed.add_field(name='Servers', value=f"Discord servers: {registry['kayn_guilds'].total()}\n"
+                                              f"Players: {players.get(('players',), 0)}\n"
+                                              f"List entries: {players.get(('ranking_list_entries',), 0)}",
+                        inline=False)
+
+        command_latency = registry['kayn_command_seconds']
+        commands_summary = {}
+        for (command, status), (count, total) in command_latency.totals().items():
+            summary = commands_summary.setdefault(command, [0, 0.0, 0])
+            summary[0] += count
+            summary[1] += total
+            if status == 'error':
+                summary[2] += count
+        lines = []
+        for command, (count, total, errors) in sorted(commands_summary.items(), key=lambda item: -item[1][0])[:10]:
+            p95 = command_latency.quantile(0.95, command, 'ok')
+            lines.append(f"{command}: {count}x, avg {total / count * 1000:.0f}ms"
+                         f"{f', p95 <{p95 * 1000:.0f}ms' if p95 is not None else ''}, {errors} errors")
+        embed.add_field(name='Commands', value='\n'.join(lines) or 'None yet', inline=False)
+
+        riot_requests = {}
+        throttled = 0
+        for (region, endpoint, status), count in registry['kayn_riot_requests_total'].values.items():
+            riot_requests[(region, endpoint)] = riot_requests.get((region, endpoint), 0) + count
+            if status == '429':
+                throttled += count
+        lines = [f'{region} {endpoint}: {count}' for (region, endpoint), count in sorted(riot_requests.items())]
+        lines.append(f'429 answers: {throttled}')
+
+        waits = {}
+        for (_, _, priority), (count, total) in registry['kayn_riot_rate_limit_wait_seconds'].totals().items():
+            priority_waits = waits.setdefault(priority, [0, 0.0])
+            priority_waits[0] += count
+            priority_waits[1] += total
+        depths = {}
+        for (_, _, priority), depth in registry['kayn_riot_queue_depth'].values.items():
+            depths[priority] = depths.get(priority, 0) + depth
+        for priority, (count, total) in sorted(waits.items()):
+            lines.append(f'{priority}: avg wait {total / count * 1000:.0f}ms, {depths.get(priority, 0)} queued')
+        embed.add_field(name='Riot API requests', value='\n'.join(lines[-15:]), inline=False)
+
+        lines = []
+        cache_stats = registry['kayn_riot_cache'].values
+        for cache in sorted({cache for cache, _ in cache_stats}):
+            hits = cache_stats.get((cache, 'hits'), 0) + cache_stats.get((cache, 'coalesced'), 0)
+            lookups = hits + cache_stats.get((cache, 'misses'), 0)
+            lines.append(f"{cache}: {hits / lookups * 100 if lookups else 0:.0f}% hits of {lookups}, "
+                         f"{cache_stats.get((cache, 'size'), 0)} cached")
+        embed.add_field(name='Riot API cache', value='\n'.join(lines) or 'None yet', inline=False)
+
+        db_totals = {}
+        for (kind, _), (count, total) in registry['kayn_db_query_seconds'].totals().items():
+            kind_totals = db_totals.setdefault(kind, [0, 0.0])
+            kind_totals[0] += count
+            kind_totals[1] += total
+        lines = [f'{kind}: {count}x, avg {total / count * 1000:.1f}ms'
+                 for kind, (count, total) in sorted(db_totals.items())]
+        embed.add_field(name='Database', value='\n'.join(lines) or 'None yet', inline=False)
+
+        await ctx.send(embed=embed)
+
+    @commands.command()
+    @commands.check(is_it_owner)
+    async def shards(self, ctx):
+        """Command responsible for showing the counters of every shard of the
+        bot, including the shards running in the other processes
+
+        :param ctx: object: A command must always have at least one parameter
+        ctx, which is the Context as the first one
+        :return: returns the message send by the bot
+        """
+        shard_rows, totals = await self.client.db.read(shards.read_shard_stats)
+
+        embed = discord.Embed(title='Shards', color=0x0080FF)
+        embed.add_field(name='Total', value=f"Discord servers: {totals['guilds']}\n"
+                                            f"Players: {totals['players']}\n"
+                                            f"List entries: {totals['ranking_list_entries']}\n"
+                                            f"Not responding: {len(totals['stale_shards'])}", inline=False)
+        lines = [f"{shard_id}: {guilds} servers, {latency * 1000:.0f}ms, pid {pid}"
+                 f"{' (not responding)' if shard_id in totals['stale_shards'] else ''}"
+                 for shard_id, guilds, latency, pid, _ in shard_rows]
+        embed.add_field(name='Shards', value='\n'.join(lines)[:1024] or 'None yet', inline=False)
+        await ctx.send(embed=embed)
+
+    @commands.command(aliases=['blocking'])
+    @commands.check(is_it_owner)
+    async def lag(self, ctx, amount: int = 5):
+        """Command responsible for showing the event loop lag and the latest
+        calls which blocked the event loop
+
+        :param ctx: object: A command must always have at least one parameter
+        ctx, which is the Context as the first one
+        :param amount: amount of the shown blocking calls
+        :return: returns the message send by the bot
+        """
+        watchdog = self.client.lag_watchdog
+        loop_lag = metrics.registry.metrics['kayn_event_loop_lag_seconds']
+        p95 = loop_lag.quantile(0.95)
+        p95_text = f'<{p95 * 1000:.0f}ms' if p95 is not None else '-'
+
+        embed = discord.Embed(title='Event loop lag', color=0x0080FF)
+        embed.add_field(name='Lag', value=f"p95: {p95_text}\n"
+                        f"Max: {watchdog.max_lag * 1000:.0f}ms\n"
+                        f"Blocks over {watchdog.threshold * 1000:.0f}ms: "
+                        f"{metrics.registry.metrics['kayn_event_loop_blocks_total'].total()}", inline=False)
+
+        for record in list(watchdog.offenders)[-max(1, min(amount, 20)):][::-1]:
+            frames = '\n'.join(frame.rsplit('/', 1)[-1] for frame in record['stack'][-3:])
+            embed.add_field(name=f"{record['command'] or record['task']} - {record['duration'] * 1000:.0f}ms",
+                            value=f"Server: {record['guild_id']}\n```{frames[-900:]}```", inline=False)
+        await ctx.send(embed=embed)
+
     @commands.command()
     @commands.has_permissions(manage_messages=True)
     @commands.check(is_it_owner)
@@ -138,3 +275,5 @@ def setup(client):
     :param client: request from the client
     """
     client.add_cog(Example(client))
+    # The cog is loaded with its first command, long after on_ready
+    print('example cogs loaded.')
@@ -0,0 +1,184 @@
+"""
+Asynchronous access to the bot database. SQLite calls never run on the event
+loop: writes are sent to a single writer thread which commits them in batched
+transactions and reads are spread over a pool of reader threads, each with its
+own connection.
+"""
+import asyncio
+import queue
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from metrics import registry
+
+DATABASE_PATH = 'database/summoners.db'
+
+# Maximum amount of the queued writes committed in a single transaction
+MAX_WRITE_BATCH = 100
+
+# Seconds a connection waits for the lock held by other process, ex. other
+# shard of the bot
+BUSY_TIMEOUT = 30
+
+DB_QUERIES = registry.histogram('kayn_db_query_seconds', 'Time of the database reads and writes by function',
+                                ('kind', 'function'))
+DB_COMMITS = registry.histogram('kayn_db_commit_seconds', 'Time of the writer transaction commits')
+DB_BATCH_SIZE = registry.histogram('kayn_db_write_batch_size', 'Writes committed in a single transaction',
+                                   buckets=(1, 2, 5, 10, 25, 50, 100))
+
+
+class Database:
+    """Class responsible for every query of the bot. Functions passed to read
+    and write get the connection as the first argument and must not commit,
+    the transaction is handled by the Database.
+
+    Parameters:
+        path: str: path of the SQLite database file
+        readers: int: amount of the reader threads
+    """
+    def __init__(self, path, readers=4):
+        self.path = path
+        self._writes = queue.Queue()
+        self._writer = None
+        self._readers = ThreadPoolExecutor(max_workers=readers, thread_name_prefix='db-reader',
+                                           initializer=self._open_reader)
+        self._local = threading.local()
+
+    def run_sync(self, function, *args):
+        """Runs the function on a temporary connection and commits it. Meant
+        only for the startup, before the event loop is running"""
+        conn = sqlite3.connect(self.path, timeout=BUSY_TIMEOUT)
+        try:
+            with conn:
+                return function(conn, *args)
+        finally:
+            conn.close()
+
+    def start(self):
+        """Starts the writer thread"""
+        if self._writer is None:
+            self._writer = threading.Thread(target=self._write_loop, name='db-writer', daemon=True)
+            self._writer.start()
+
+    def close(self):
+        """Commits the queued writes and stops every thread"""
+        if self._writer is not None:
+            self._writes.put(None)
+            self._writer.join()
+            self._writer = None
+        self._readers.shutdown()
+
+    def _open_reader(self):
+        self._local.conn = sqlite3.connect(self.path, timeout=BUSY_TIMEOUT)
+        self._local.conn.execute("PRAGMA query_only = ON")
+
+    def _read(self, function, args, name):
+        started = time.perf_counter()
+        try:
+            return function(self._local.conn, *args)
+        finally:
+            DB_QUERIES.observe(time.perf_counter() - started, 'read', name)
+
+    def _write_loop(self):
+        """Takes the queued writes and commits them in batches. Every write has
+        its own savepoint, so a failing write doesn't roll back the others"""
+        conn = sqlite3.connect(self.path, isolation_level=None, timeout=BUSY_TIMEOUT)
+        running = True
+
+        while running:
+            batch = [self._writes.get()]
+            while len(batch) < MAX_WRITE_BATCH:
+                try:
+                    batch.append(self._writes.get_nowait())
+                except queue.Empty:
+                    break
+
+            if None in batch:
+                running = False
+                batch = [job for job in batch if job is not None]
+
+            results = []
+            try:
+                conn.execute("BEGIN IMMEDIATE")
+            except sqlite3.Error as err:
+                for future, _, _, _ in batch:
+                    future.set_exception(err)
+                continue
+
+            for future, function, args, name in batch:
+                started = time.perf_counter()
+                conn.execute("SAVEPOINT job")
+                try:
+                    results.append((future, function(conn, *args), None))
+                    conn.execute("RELEASE job")
+                except Exception as err:
+                    conn.execute("ROLLBACK TO job")
+                    conn.execute("RELEASE job")
+                    results.append((future, None, err))
+                DB_QUERIES.observe(time.perf_counter() - started, 'write', name)
+
+            started = time.perf_counter()
+            try:
+                conn.execute("COMMIT")
+            except sqlite3.Error as err:
+                conn.execute("ROLLBACK")
+                results = [(future, None, err) for future, _, _ in results]
+            DB_COMMITS.observe(time.perf_counter() - started)
+            DB_BATCH_SIZE.observe(len(batch))
+
+            for future, result, err in results:
+                if err is not None:
+                    future.set_exception(err)
+                else:
+                    future.set_result(result)
+
+        conn.close()
+
+    async def _write(self, function, args, name):
+        future = Future()
+        self._writes.put((future, function, args, name))
+        return await asyncio.wrap_future(future)
+
+    async def _read_async(self, function, args, name):
+        loop = asyncio.get_event_loop()
+        return await loop.run_in_executor(self._readers, self._read, function, args, name)
+
+    async def write(self, function, *args):
+        """Runs function(conn, *args) inside of the writer transaction
+
+        Returns:
+            object: value returned by the function
+        """
+        return await self._write(function, args, getattr(function, '__name__', 'write'))
+
+    async def read(self, function, *args):
+        """Runs function(conn, *args) on one of the reader connections
+
+        Returns:
+            object: value returned by the function
+        """
+        return await self._read_async(function, args, getattr(function, '__name__', 'read'))
+
+    async def execute(self, sql, params=()):
+        """Executes single writing statement
+
+        Returns:
+            int: amount of the changed rows
+        """
+        return await self._write(lambda conn: conn.execute(sql, params).rowcount, (), 'execute')
+
+    async def executemany(self, sql, seq_of_params):
+        """Executes writing statement for every set of the parameters
+
+        Returns:
+            int: amount of the changed rows
+        """
+        return await self._write(lambda conn: conn.executemany(sql, seq_of_params).rowcount, (), 'executemany')
+
+    async def fetchone(self, sql, params=()):
+        return await self._read_async(lambda conn: conn.execute(sql, params).fetchone(), (), 'fetchone')
+
+    async def fetchall(self, sql, params=()):
+        return await self._read_async(lambda conn: conn.execute(sql, params).fetchall(), (), 'fetchall')
@@ -0,0 +1,113 @@
+"""
+In-memory copy of the server_config table. The prefix of the discord server
+is needed for every message the bot sees, so it's resolved from a dictionary
+and the database is only touched when the configuration changes.
+"""
+import roster
+
+DEFAULT_PREFIX = '$'
+DEFAULT_REGION = 'eun1'
+
+
+def sync_guilds(conn, guild_ids, owns=None):
+    """Brings the stored discord servers in line with the ones the bot is in.
+    Servers joined while the bot was offline get the default configuration,
+    the configuration and the ranking list of the servers it left are deleted
+
+    Parameters:
+        conn: sqlite3.Connection: connection of the Database writer
+        guild_ids: iterable: ids of the discord servers the bot is in
+        owns: callable: tells if the discord server belongs to this process,
+        every server does when not given
+
+    Returns:
+        tuple: lists of the added and of the removed discord server ids
+    """
+    current = set(guild_ids)
+    configured = {row[0] for row in conn.execute("SELECT guild_id FROM server_config")}
+    stored = configured.union(roster.tracked_guilds(conn))
+    if owns is not None:
+        stored = {guild_id for guild_id in stored if owns(guild_id)}
+
+    added = sorted(current - configured)
+    # Empty list of the servers is rather a broken connection than the bot
+    # removed from every server
+    removed = sorted(stored - current) if current else []
+
+    conn.executemany("INSERT OR IGNORE INTO server_config VALUES (?, ?, ?)",
+                     [(guild_id, DEFAULT_REGION, DEFAULT_PREFIX) for guild_id in added])
+    conn.executemany("DELETE FROM server_config WHERE guild_id = ?", [(guild_id,) for guild_id in removed])
+    for guild_id in removed:
+        roster.delete_guild_players(conn, guild_id)
+    return added, removed
+
+
+class GuildConfigCache:
+    """Class responsible for keeping the prefix and the region of every
+    discord server. Changes are written to the database first and then
+    applied to the memory.
+
+    Parameters:
+        db: Database: asynchronous access to the bot database
+    """
+    def __init__(self, db):
+        self._db = db
+        self._configs = {}
+
+    def load(self, conn):
+        """Reads the whole server_config table into the memory
+
+        Parameters:
+            conn: sqlite3.Connection: connection used during the startup
+        """
+        rows = conn.execute("SELECT guild_id, region, prefix FROM server_config").fetchall()
+        self._configs = {guild_id: [region, prefix] for guild_id, region, prefix in rows}
+
+    def __contains__(self, guild_id):
+        return guild_id in self._configs
+
+    def __len__(self):
+        return len(self._configs)
+
+    def prefix(self, guild_id):
+        """Returns the prefix of the discord server or the default one"""
+        config = self._configs.get(guild_id)
+        return config[1] if config is not None else DEFAULT_PREFIX
+
+    def region(self, guild_id):
+        """Returns the region of the discord server or the default one"""
+        config = self._configs.get(guild_id)
+        return config[0] if config is not None else DEFAULT_REGION
+
+    async def sync(self, guild_ids, owns=None):
+        """Adds the missing and removes the left discord servers in a single
+        transaction, see sync_guilds
+
+        Returns:
+            tuple: lists of the added and of the removed discord server ids
+        """
+        added, removed = await self._db.write(sync_guilds, guild_ids, owns)
+        for guild_id in added:
+            self._configs[guild_id] = [DEFAULT_REGION, DEFAULT_PREFIX]
+        for guild_id in removed:
+            self._configs.pop(guild_id, None)
+        return added, removed
+
+    async def add_guild(self, guild_id, region=DEFAULT_REGION, prefix=DEFAULT_PREFIX):
+        await self._db.execute("INSERT OR REPLACE INTO server_config VALUES (:guild_id, :region, :prefix)",
+                               {'guild_id': guild_id, 'region': region, 'prefix': prefix})
+        self._configs[guild_id] = [region, prefix]
+
+    async def remove_guild(self, guild_id):
+        await self._db.execute("DELETE FROM server_config WHERE guild_id = :guild_id", {'guild_id': guild_id})
+        self._configs.pop(guild_id, None)
+
+    async def set_prefix(self, guild_id, prefix):
+        await self._db.execute("UPDATE server_config SET prefix = :prefix WHERE guild_id = :guild_id",
+                               {'guild_id': guild_id, 'prefix': prefix})
+        self._configs.setdefault(guild_id, [DEFAULT_REGION, DEFAULT_PREFIX])[1] = prefix
+
+    async def set_region(self, guild_id, region):
+        await self._db.execute("UPDATE server_config SET region = :region WHERE guild_id = :guild_id",
+                               {'guild_id': guild_id, 'region': region})
+        self._configs.setdefault(guild_id, [DEFAULT_REGION, DEFAULT_PREFIX])[0] = region
@@ -0,0 +1,86 @@
+"""
+LP history of the tracked summoners. Every observed ranked entry is stored in
+the lp_history table, unchanged observations are skipped and old points are
+rolled up into hourly and later daily points so the database stays small.
+"""
+import time
+
+QUEUE_IDS = {'solo': 0, 'flex': 1}
+
+RAW = 0
+HOURLY = 1
+DAILY = 2
+
+# Age in seconds after which the points are rolled up into a lower resolution
+RAW_RETENTION = 2 * 24 * 3600
+HOURLY_RETENTION = 30 * 24 * 3600
+
+
+def record_snapshot(conn, snapshot):
+    """Stores every ranked entry of the snapshot which differs from the latest
+    stored point of the summoner
+
+    Parameters:
+        conn: sqlite3.Connection: connection to the bot database
+        snapshot: Snapshot: freshly downloaded ranked entries
+
+    Returns:
+        int: amount of the stored points
+    """
+    observed_at = int(snapshot.taken_at)
+    points = []
+
+    for queue, entries in snapshot.queues.items():
+        for entry in entries:
+            point = (entry.tier, entry.rank, entry.league_points, entry.wins, entry.losses)
+            latest = conn.execute("""SELECT tier, rank, league_points, wins, losses FROM lp_history
+                                  WHERE riot_id = ? AND queue = ? ORDER BY observed_at DESC LIMIT 1""",
+                                  (entry.riot_id, QUEUE_IDS[queue])).fetchone()
+            if latest != point:
+                points.append((entry.riot_id, QUEUE_IDS[queue], observed_at, RAW) + point)
+
+    if points:
+        conn.executemany("INSERT OR REPLACE INTO lp_history VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", points)
+
+    return len(points)
+
+
+def _roll_up(conn, source, target, bucket, cutoff):
+    """Replaces the points of the source resolution older than cutoff with the
+    last point of every bucket"""
+    conn.execute("""INSERT OR REPLACE INTO lp_history
+                 SELECT riot_id, queue, last_seen / :bucket * :bucket, :target,
+                        tier, rank, league_points, wins, losses
+                 FROM (SELECT riot_id, queue, MAX(observed_at) AS last_seen,
+                              tier, rank, league_points, wins, losses
+                       FROM lp_history
+                       WHERE resolution = :source AND observed_at < :cutoff
+                       GROUP BY riot_id, queue, observed_at / :bucket)""",
+                 {'bucket': bucket, 'source': source, 'target': target, 'cutoff': cutoff})
+    conn.execute("DELETE FROM lp_history WHERE resolution = :source AND observed_at < :cutoff",
+                 {'source': source, 'cutoff': cutoff})
+
+
+def roll_up(conn, now=None):
+    """Rolls the raw points up into hourly points and the hourly points into
+    daily points"""
+    now = int(now if now is not None else time.time())
+    _roll_up(conn, RAW, HOURLY, 3600, now - RAW_RETENTION)
+    _roll_up(conn, HOURLY, DAILY, 24 * 3600, now - HOURLY_RETENTION)
+
+
+def read_history(conn, riot_id, queue, since):
+    """Returns the points of the summoner newer than since, oldest first
+
+    Parameters:
+        conn: sqlite3.Connection: connection to the bot database
+        riot_id: str: encrypted summoner id
+        queue: str: solo or flex
+        since: int: unix time of the oldest point
+
+    Returns:
+        list: (observed_at, tier, rank, league_points, wins, losses) tuples
+    """
+    return conn.execute("""SELECT observed_at, tier, rank, league_points, wins, losses FROM lp_history
+                        WHERE riot_id = ? AND queue = ? AND observed_at >= ?
+                        ORDER BY observed_at""", (riot_id, QUEUE_IDS[queue], since)).fetchall()
@@ -0,0 +1,170 @@
+"""
+Identity cache of the summoners shared by every discord server. The encrypted
+id, puuid and name of a summoner are stored in the summoner_identities table
+together with the moment Riot last confirmed them, and kept in the memory in
+front of it. Lookups by name or by id only go to the Riot API when the stored
+identity is older than the TTL.
+"""
+import time
+
+from metrics import registry
+from riot_api import RiotApiError
+
+# Seconds for which the confirmed identity is trusted
+IDENTITY_TTL = 86400
+
+IDENTITY_LOOKUPS = registry.counter('kayn_identity_lookups_total', 'Summoner identity lookups by the answering layer',
+                                    ('kind', 'source'))
+
+
+def normalize_name(summoner_name):
+    """Returns the summoner name the way Riot compares them, without the
+    spaces and the letter case"""
+    return summoner_name.replace(' ', '').casefold()
+
+
+def _summoner(row):
+    region, riot_id, puuid, summoner_name, verified_at = row
+    return {'id': riot_id, 'puuid': puuid, 'name': summoner_name, 'region': region, 'verified_at': verified_at}
+
+
+def load_identities(conn, since):
+    """Returns the identities confirmed after the given unix time"""
+    rows = conn.execute("""SELECT riot_region, riot_id, puuid, summoner_name, verified_at
+                        FROM summoner_identities WHERE verified_at >= ?""", (since,)).fetchall()
+    return [_summoner(row) for row in rows]
+
+
+def find_by_name(conn, region, summoner_name):
+    row = conn.execute("""SELECT riot_region, riot_id, puuid, summoner_name, verified_at FROM summoner_identities
+                       WHERE riot_region = ? AND normalized_name = ?""",
+                       (region, normalize_name(summoner_name))).fetchone()
+    return _summoner(row) if row is not None else None
+
+
+def find_by_id(conn, region, riot_id):
+    row = conn.execute("""SELECT riot_region, riot_id, puuid, summoner_name, verified_at FROM summoner_identities
+                       WHERE riot_region = ? AND riot_id = ?""", (region, riot_id)).fetchone()
+    return _summoner(row) if row is not None else None
+
+
+def store_identity(conn, summoner):
+    """Stores the identity confirmed by Riot. Other summoner which used to
+    have the same name loses it"""
+    normalized_name = normalize_name(summoner['name'])
+    conn.execute("DELETE FROM summoner_identities WHERE riot_region = ? AND normalized_name = ? AND riot_id != ?",
+                 (summoner['region'], normalized_name, summoner['id']))
+    conn.execute("""INSERT INTO summoner_identities VALUES (?, ?, ?, ?, ?, ?)
+                 ON CONFLICT (riot_region, riot_id) DO UPDATE SET normalized_name = excluded.normalized_name,
+                 puuid = excluded.puuid, summoner_name = excluded.summoner_name,
+                 verified_at = excluded.verified_at""",
+                 (summoner['region'], summoner['id'], normalized_name, summoner.get('puuid'), summoner['name'],
+                  summoner['verified_at']))
+
+
+def delete_identity(conn, region, riot_id):
+    conn.execute("DELETE FROM summoner_identities WHERE riot_region = ? AND riot_id = ?", (region, riot_id))
+
+
+class IdentityCache:
+    """Class responsible for resolving the summoner names and ids, first from
+    the memory, then from the database and only then from the Riot API
+
+    Parameters:
+        db: Database: asynchronous access to the bot database
+        riot: RiotClient: client of the Riot API
+        ttl: float: seconds for which the confirmed identity is trusted
+    """
+    def __init__(self, db, riot, ttl=IDENTITY_TTL):
+        self._db = db
+        self._riot = riot
+        self.ttl = ttl
+        self._by_name = {}
+        self._by_id = {}
+
+    def load(self, conn):
+        """Reads the identities which are still fresh into the memory
+
+        Parameters:
+            conn: sqlite3.Connection: connection used during the startup
+        """
+        for summoner in load_identities(conn, time.time() - self.ttl):
+            self._remember(summoner)
+
+    def __len__(self):
+        return len(self._by_id)
+
+    def _remember(self, summoner):
+        region = summoner['region']
+        previous = self._by_id.get((region, summoner['id']))
+        if previous is not None:
+            self._by_name.pop((region, normalize_name(previous['name'])), None)
+        self._by_id[(region, summoner['id'])] = summoner
+        self._by_name[(region, normalize_name(summoner['name']))] = summoner
+
+    def _forget(self, region, riot_id):
+        previous = self._by_id.pop((region, riot_id), None)
+        if previous is not None:
+            self._by_name.pop((region, normalize_name(previous['name'])), None)
+
+    def _fresh(self, summoner):
+        return summoner is not None and time.time() - summoner['verified_at'] < self.ttl
+
+    async def _confirmed(self, region, summoner_data):
+        """Stores the summoner-v4 data just downloaded from Riot"""
+        summoner = {'id': summoner_data['id'], 'puuid': summoner_data.get('puuid'), 'name': summoner_data['name'],
+                    'region': region, 'verified_at': int(time.time())}
+        await self._db.write(store_identity, summoner)
+        stale = self._by_name.get((region, normalize_name(summoner['name'])))
+        if stale is not None and stale['id'] != summoner['id']:
+            self._forget(region, stale['id'])
+        self._remember(summoner)
+        return summoner
+
+    async def by_name(self, region, summoner_name):
+        """Returns the identity of the summoner with given name
+
+        Returns:
+            dict: id, puuid and name of the summoner
+        """
+        summoner = self._by_name.get((region, normalize_name(summoner_name)))
+        if self._fresh(summoner):
+            IDENTITY_LOOKUPS.inc('name', 'memory')
+            return summoner
+
+        summoner = await self._db.read(find_by_name, region, summoner_name)
+        if self._fresh(summoner):
+            IDENTITY_LOOKUPS.inc('name', 'database')
+            self._remember(summoner)
+            return summoner
+
+        IDENTITY_LOOKUPS.inc('name', 'riot')
+        return await self._confirmed(region, await self._riot.summoner_by_name(region, summoner_name))
+
+    async def by_id(self, region, riot_id):
+        """Returns the identity of the summoner with given encrypted id. The
+        identity is dropped when Riot doesn't know the id anymore
+
+        Returns:
+            dict: id, puuid and name of the summoner
+        """
+        summoner = self._by_id.get((region, riot_id))
+        if self._fresh(summoner):
+            IDENTITY_LOOKUPS.inc('id', 'memory')
+            return summoner
+
+        summoner = await self._db.read(find_by_id, region, riot_id)
+        if self._fresh(summoner):
+            IDENTITY_LOOKUPS.inc('id', 'database')
+            self._remember(summoner)
+            return summoner
+
+        IDENTITY_LOOKUPS.inc('id', 'riot')
+        try:
+            summoner_data = await self._riot.summoner_by_id(region, riot_id)
+        except RiotApiError as err:
+            if err.status in (400, 404):
+                self._forget(region, riot_id)
+                await self._db.write(delete_identity, region, riot_id)
+            raise
+        return await self._confirmed(region, summoner_data)
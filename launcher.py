@@ -0,0 +1,125 @@
+"""
+Runs the bot as many processes, each of them connected with its own part of
+the shards. The database is migrated once before the processes start, every
+process gets its own metrics port and a process which exits is started again.
+
+    python launcher.py --shards 8 --processes 4
+"""
+import argparse
+import os
+import signal
+import subprocess
+import sys
+import time
+
+from database import DATABASE_PATH, Database
+from metrics import METRICS_PORT
+from migrations import run_migrations
+
+# Seconds between the checks of the processes and the delays of the restarts
+# of a process which keeps on crashing
+CHECK_INTERVAL = 1
+RESTART_DELAY = 5
+MAX_RESTART_DELAY = 300
+
+
+def split_shards(shard_count, processes):
+    """Spreads the shards over the processes, consecutive shards go to the
+    same process
+
+    Returns:
+        list: shard ids of every process
+    """
+    processes = min(processes, shard_count)
+    return [list(range(index * shard_count // processes, (index + 1) * shard_count // processes))
+            for index in range(processes)]
+
+
+class ShardProcess:
+    """Single bot process running main.py with the given shards
+
+    Parameters:
+        index: int: number of the process
+        shard_count: int: amount of the shards of the whole bot
+        shard_ids: list: shards connected by this process
+        processes: int: amount of the bot processes sharing the Riot API key
+    """
+    def __init__(self, index, shard_count, shard_ids, processes):
+        self.index = index
+        self.shard_count = shard_count
+        self.shard_ids = shard_ids
+        self.processes = processes
+        self.process = None
+        self.restart_at = 0
+        self.restart_delay = RESTART_DELAY
+        self.started_at = 0
+
+    def start(self):
+        env = dict(os.environ)
+        env['SHARD_COUNT'] = str(self.shard_count)
+        env['SHARD_IDS'] = ','.join(str(shard_id) for shard_id in self.shard_ids)
+        env['SHARD_PROCESSES'] = str(self.processes)
+        env['METRICS_PORT'] = str(METRICS_PORT + self.index if METRICS_PORT else 0)
+        self.process = subprocess.Popen([sys.executable, 'main.py'], env=env)
+        self.started_at = time.monotonic()
+        print(f'Started process {self.index} (pid {self.process.pid}) with shards {env["SHARD_IDS"]}')
+
+    def check(self):
+        """Starts the process again when it exited, waiting longer every time
+        it exits soon after the start"""
+        now = time.monotonic()
+        if self.process is None:
+            if now >= self.restart_at:
+                self.start()
+            return
+
+        code = self.process.poll()
+        if code is None:
+            return
+
+        if now - self.started_at > MAX_RESTART_DELAY:
+            self.restart_delay = RESTART_DELAY
+        print(f'Process {self.index} exited with {code}, restarting in {self.restart_delay}s')
+        self.process = None
+        self.restart_at = now + self.restart_delay
+        self.restart_delay = min(self.restart_delay * 2, MAX_RESTART_DELAY)
+
+    def stop(self):
+        if self.process is not None and self.process.poll() is None:
+            self.process.send_signal(signal.SIGINT)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Runs the bot as many shard processes')
+    parser.add_argument('--shards', type=int, required=True, help='amount of the shards of the whole bot')
+    parser.add_argument('--processes', type=int, default=os.cpu_count(), help='amount of the bot processes')
+    args = parser.parse_args()
+
+    Database(DATABASE_PATH).run_sync(run_migrations)
+
+    shard_groups = split_shards(args.shards, args.processes)
+    shard_processes = [ShardProcess(index, args.shards, shard_ids, len(shard_groups))
+                       for index, shard_ids in enumerate(shard_groups)]
+
+    stopping = []
+    signal.signal(signal.SIGTERM, lambda *_: stopping.append(True))
+    signal.signal(signal.SIGINT, lambda *_: stopping.append(True))
+
+    for shard_process in shard_processes:
+        shard_process.start()
+
+    while not stopping:
+        time.sleep(CHECK_INTERVAL)
+        for shard_process in shard_processes:
+            shard_process.check()
+
+    print('Stopping the bot processes')
+    for shard_process in shard_processes:
+        shard_process.stop()
+    for shard_process in shard_processes:
+        if shard_process.process is not None:
+            shard_process.process.wait()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,258 @@
+"""
+Ranked ladder of the tracked summoners. Every league entry gets a single
+numeric score when it's downloaded and every discord server keeps the entries
+of each queue ordered by that score, updating only the entries which changed.
+The latest entries are also stored in the league_entries table, which answers
+the regional ladder shared by all discord servers.
+"""
+from bisect import bisect_left, insort
+from itertools import count
+
+from history import QUEUE_IDS
+
+TIERS = ['IRON', 'BRONZE', 'SILVER', 'GOLD', 'PLATINUM', 'EMERALD', 'DIAMOND',
+         'MASTER', 'GRANDMASTER', 'CHALLENGER']
+TIER_SCORES = {tier: index for index, tier in enumerate(TIERS)}
+DIVISION_SCORES = {'IV': 0, 'III': 1, 'II': 2, 'I': 3}
+
+# LP never reaches this value, so the divisions never overlap
+DIVISION_WIDTH = 10000
+
+# Versions are unique among all the leaderboards of the process
+_versions = count(1)
+
+
+def rank_score(tier, rank, league_points):
+    """Returns the ladder score of the ranked entry, higher is better
+
+    Parameters:
+        tier: str: tier of the entry ex. GOLD
+        rank: str: division of the entry ex. II
+        league_points: int: league points of the entry
+
+    Returns:
+        int: ladder score
+    """
+    division = TIER_SCORES.get(tier, 0) * len(DIVISION_SCORES) + DIVISION_SCORES.get(rank, 3)
+    return division * DIVISION_WIDTH + league_points
+
+
+class LadderEntry:
+    """Ranked entry of a single summoner with its precomputed ladder score
+    and the platform id of the summoner region"""
+    __slots__ = ('summoner_name', 'riot_id', 'tier', 'rank', 'league_points', 'wins', 'losses', 'region', 'score')
+
+    def __init__(self, summoner_name, riot_id, tier, rank, league_points, wins, losses, region):
+        self.summoner_name = summoner_name
+        self.riot_id = riot_id
+        self.tier = tier
+        self.rank = rank
+        self.league_points = league_points
+        self.wins = wins
+        self.losses = losses
+        self.region = region
+        self.score = rank_score(tier, rank, league_points)
+
+    @classmethod
+    def from_league_entry(cls, summoner_name, ranked_entry, region):
+        """Creates the entry from the league-v4 data of the region"""
+        return cls(summoner_name, ranked_entry['summonerId'], ranked_entry['tier'], ranked_entry['rank'],
+                   ranked_entry['leaguePoints'], ranked_entry['wins'], ranked_entry['losses'], region)
+
+    @property
+    def sort_key(self):
+        return -self.score, self.riot_id
+
+    def __eq__(self, other):
+        return isinstance(other, LadderEntry) and all(
+            getattr(self, name) == getattr(other, name) for name in self.__slots__)
+
+    def __repr__(self):
+        return f'{self.summoner_name} {self.tier} {self.rank} {self.league_points} LP'
+
+
+class Leaderboard:
+    """Entries of a single queue ordered by the ladder score. Position lookups
+    are binary searches over the sorted keys. The version changes together
+    with the content of the leaderboard."""
+    def __init__(self):
+        self._keys = []
+        self._entries = {}
+        self.version = next(_versions)
+
+    def __len__(self):
+        return len(self._keys)
+
+    def update(self, entry):
+        """Inserts the entry or replaces the previous entry of the summoner
+
+        Returns:
+            bool: False when the entry didn't change
+        """
+        previous = self._entries.get(entry.riot_id)
+        if previous == entry:
+            return False
+        if previous is not None:
+            del self._keys[bisect_left(self._keys, previous.sort_key)]
+        insort(self._keys, entry.sort_key)
+        self._entries[entry.riot_id] = entry
+        self.version = next(_versions)
+        return True
+
+    def remove(self, riot_id):
+        previous = self._entries.pop(riot_id, None)
+        if previous is not None:
+            del self._keys[bisect_left(self._keys, previous.sort_key)]
+            self.version = next(_versions)
+
+    def top(self, amount=None):
+        """Returns the best entries, all of them when amount is not given"""
+        keys = self._keys if amount is None else self._keys[:amount]
+        return [self._entries[riot_id] for _, riot_id in keys]
+
+    def position(self, riot_id):
+        """Returns the 1-based position of the summoner or None"""
+        entry = self._entries.get(riot_id)
+        if entry is None:
+            return None
+        return bisect_left(self._keys, entry.sort_key) + 1
+
+    def replace_all(self, entries, keep=()):
+        """Applies the new entries of the queue, updating only the changed
+        ones and removing the summoners which are not there anymore
+
+        Parameters:
+            entries: iterable: current LadderEntry of every ranked summoner
+            keep: iterable: ids of the summoners whose previous entries stay,
+            for example because they couldn't be downloaded
+
+        Returns:
+            int: amount of the changed entries
+        """
+        changed = 0
+        current_ids = set(keep)
+        for entry in entries:
+            current_ids.add(entry.riot_id)
+            changed += self.update(entry)
+        for riot_id in [riot_id for riot_id in self._entries if riot_id not in current_ids]:
+            self.remove(riot_id)
+            changed += 1
+        return changed
+
+
+def store_entries(conn, snapshot):
+    """Stores the entries of the snapshot in league_entries and moves the
+    ladder version of every region and queue in which something changed. The
+    snapshot can mix the summoners of many regions. Summoners downloaded
+    without an entry of the queue lose their stored entry, the failed ones
+    keep it.
+
+    Parameters:
+        conn: sqlite3.Connection: connection of the Database writer
+        snapshot: Snapshot: freshly downloaded ranked entries
+
+    Returns:
+        int: amount of the changed entries
+    """
+    regional_entries = {}
+    for queue, entries in snapshot.queues.items():
+        for entry in entries:
+            regional_entries.setdefault((entry.region, queue), []).append(entry)
+
+    downloaded = {}
+    for region, riot_id in snapshot.downloaded:
+        downloaded.setdefault(region, set()).add(riot_id)
+    for region in downloaded:
+        for queue in snapshot.queues:
+            regional_entries.setdefault((region, queue), [])
+
+    changed = 0
+    for (region, queue), entries in regional_entries.items():
+        changes_before = conn.total_changes
+        conn.executemany("""INSERT INTO league_entries VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                         ON CONFLICT (riot_region, queue, riot_id) DO UPDATE SET
+                         tier = excluded.tier, rank = excluded.rank, league_points = excluded.league_points,
+                         wins = excluded.wins, losses = excluded.losses, score = excluded.score
+                         WHERE score != excluded.score OR wins != excluded.wins OR losses != excluded.losses""",
+                         [(region, QUEUE_IDS[queue], entry.riot_id, entry.tier, entry.rank, entry.league_points,
+                           entry.wins, entry.losses, entry.score) for entry in entries])
+        # Unranked after the season reset or simply missing from the answer
+        dropped = downloaded.get(region, set()).difference(entry.riot_id for entry in entries)
+        conn.executemany("DELETE FROM league_entries WHERE riot_region = ? AND queue = ? AND riot_id = ?",
+                         [(region, QUEUE_IDS[queue], riot_id) for riot_id in dropped])
+        queue_changed = conn.total_changes - changes_before
+        if queue_changed:
+            bump_ladder_versions(conn, region, QUEUE_IDS[queue])
+            changed += queue_changed
+    return changed
+
+
+def delete_entries(conn, summoners):
+    """Deletes the entries of every queue of the summoners which are not
+    tracked anymore
+
+    Parameters:
+        conn: sqlite3.Connection: connection of the Database writer
+        summoners: list: (region, riot_id) of the summoners
+    """
+    queues = ','.join(str(queue_id) for queue_id in QUEUE_IDS.values())
+    conn.executemany(f"DELETE FROM league_entries WHERE riot_region = ? AND queue IN ({queues}) AND riot_id = ?",
+                     summoners)
+
+
+def bump_ladder_versions(conn, region=None, queue=None):
+    """Marks the regional ladders as changed, every one of them when region
+    is not given"""
+    if region is None:
+        conn.execute("UPDATE ladder_versions SET version = version + 1")
+    elif queue is None:
+        conn.execute("UPDATE ladder_versions SET version = version + 1 WHERE riot_region = ?", (region,))
+    else:
+        conn.execute("""INSERT INTO ladder_versions VALUES (?, ?, 1)
+                     ON CONFLICT (riot_region, queue) DO UPDATE SET version = version + 1""", (region, queue))
+
+
+def ladder_version(conn, region, queue):
+    row = conn.execute("SELECT version FROM ladder_versions WHERE riot_region = ? AND queue = ?",
+                       (region, QUEUE_IDS[queue])).fetchone()
+    return row[0] if row is not None else 0
+
+
+def top_entries(conn, region, queue, amount):
+    """Returns the best entries of the region walking the score index, so only
+    the requested amount of rows is read
+
+    Returns:
+        list: LadderEntry of the best summoners
+    """
+    rows = conn.execute("""SELECT players.summoner_name, league_entries.riot_id, tier, rank,
+                        league_points, wins, losses, league_entries.riot_region
+                        FROM league_entries JOIN players ON players.riot_id = league_entries.riot_id
+                        AND players.riot_region = league_entries.riot_region
+                        WHERE league_entries.riot_region = ? AND queue = ?
+                        ORDER BY score DESC, league_entries.riot_id LIMIT ?""",
+                        (region, QUEUE_IDS[queue], amount)).fetchall()
+    return [LadderEntry(*row) for row in rows]
+
+
+class RegionalLadder:
+    """Class responsible for answering the regional top-K queries. Results
+    are kept until the ladder version of the region and queue changes.
+
+    Parameters:
+        db: Database: asynchronous access to the bot database
+    """
+    def __init__(self, db):
+        self._db = db
+        self._cache = {}
+
+    async def top(self, region, queue, amount):
+        """Returns the best entries of the region and queue"""
+        version = await self._db.read(ladder_version, region, queue)
+        cached = self._cache.get((region, queue, amount))
+        if cached is not None and cached[0] == version:
+            return cached[1]
+
+        entries = await self._db.read(top_entries, region, queue, amount)
+        self._cache[(region, queue, amount)] = (version, entries)
+        return entries
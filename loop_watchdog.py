@@ -0,0 +1,129 @@
+"""
+Event loop watchdog. A heartbeat coroutine measures how late the event loop
+wakes it up, and a monitor thread notices when the heartbeat stops. While the
+loop is still blocked the thread captures the stack of the loop thread and the
+command which is running in the current task, so every blocking call can be
+traced back to the command which made it.
+"""
+import asyncio
+import json
+import sys
+import threading
+import time
+import traceback
+from collections import deque
+from contextlib import contextmanager
+
+from metrics import registry
+
+# Seconds between the heartbeats and the block after which the stack is taken
+LAG_CHECK_INTERVAL = 0.1
+BLOCKING_THRESHOLD = 0.25
+
+# Amount of the remembered blocking records and of their innermost frames
+OFFENDERS_KEPT = 50
+STACK_DEPTH = 12
+
+LOOP_LAG = registry.histogram('kayn_event_loop_lag_seconds', 'Delay of the event loop heartbeat',
+                              buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10))
+LOOP_BLOCKS = registry.counter('kayn_event_loop_blocks_total', 'Event loop blocks longer than the threshold',
+                               ('command',))
+
+
+class LagWatchdog:
+    """Class responsible for measuring the event loop lag and recording the
+    calls which blocked the loop
+
+    Parameters:
+        interval: float: seconds between the heartbeats
+        threshold: float: seconds of the block which is recorded
+        kept: int: amount of the remembered records
+    """
+    def __init__(self, interval=LAG_CHECK_INTERVAL, threshold=BLOCKING_THRESHOLD, kept=OFFENDERS_KEPT):
+        self.interval = interval
+        self.threshold = threshold
+        self.offenders = deque(maxlen=kept)
+        self.max_lag = 0.0
+        self._loop = None
+        self._loop_thread = None
+        self._last_beat = 0.0
+        self._commands = {}
+        self._heartbeat = None
+        self._monitor = None
+        self._running = False
+
+    def start(self):
+        """Starts the heartbeat and the monitor thread, called from the event
+        loop"""
+        if self._running:
+            return
+        self._running = True
+        self._loop = asyncio.get_event_loop()
+        self._loop_thread = threading.get_ident()
+        self._last_beat = time.monotonic()
+        self._heartbeat = asyncio.ensure_future(self._beat())
+        self._monitor = threading.Thread(target=self._watch, name='loop-watchdog', daemon=True)
+        self._monitor.start()
+
+    def stop(self):
+        self._running = False
+        if self._heartbeat is not None:
+            self._heartbeat.cancel()
+
+    @contextmanager
+    def track(self, command, guild_id=None):
+        """Marks the current task as running the command, so the blocks
+        happening inside of it are attributed to the command"""
+        task = asyncio.current_task()
+        self._commands[task] = (command, guild_id)
+        try:
+            yield
+        finally:
+            self._commands.pop(task, None)
+
+    async def _beat(self):
+        while True:
+            expected = time.monotonic() + self.interval
+            await asyncio.sleep(self.interval)
+            now = time.monotonic()
+            lag = max(0.0, now - expected)
+            self._last_beat = now
+            self.max_lag = max(self.max_lag, lag)
+            LOOP_LAG.observe(lag)
+
+    def _running_task(self):
+        """Returns the command and the name of the task running on the loop"""
+        task = asyncio.current_task(self._loop)
+        if task is None:
+            return None, None, 'callback'
+        command, guild_id = self._commands.get(task, (None, None))
+        coro = task.get_coro()
+        return command, guild_id, getattr(coro, '__qualname__', repr(coro))
+
+    def _watch(self):
+        """Waits for the heartbeat to stop, captures the stack once per block
+        and logs the record when the loop runs again"""
+        record = None
+        while self._running:
+            time.sleep(self.interval / 2)
+            blocked_for = time.monotonic() - self._last_beat - self.interval
+
+            if record is None and blocked_for > self.threshold:
+                frame = sys._current_frames().get(self._loop_thread)
+                stack = traceback.extract_stack(frame)[-STACK_DEPTH:] if frame is not None else []
+                command, guild_id, task = self._running_task()
+                record = {
+                    'event': 'event_loop_blocked',
+                    'started_at': round(time.time() - blocked_for, 3),
+                    'command': command,
+                    'guild_id': guild_id,
+                    'task': task,
+                    'stack': [f'{entry.filename}:{entry.lineno} {entry.name}' for entry in stack],
+                    'last_beat': self._last_beat,
+                }
+            elif record is not None and self._last_beat != record['last_beat']:
+                record['duration'] = round(self._last_beat - record.pop('last_beat') - self.interval, 3)
+                self.offenders.append(record)
+                LOOP_BLOCKS.inc(record['command'] or record['task'])
+                print(json.dumps(record))
+                record = None
@@ -2,25 +2,128 @@
 Discord bot for League of Legends Responsible for making a ranking of solo que
 among the friends from the same discord server.
 """
+import asyncio
+import csv
+import datetime
 import os
-import json
-import urllib.request
-import urllib.parse
-import sqlite3
+import time
 from random import choice
 import discord
 
 from discord.ext import commands, tasks
 from discord.ext.commands import has_permissions
 
+import history
+import leaderboard
+import matches
+import metrics
+import regions
+import renderer
+import roster
+import shards
+from database import DATABASE_PATH, Database
+from guild_config import GuildConfigCache, DEFAULT_PREFIX
+from identities import IdentityCache
+from loop_watchdog import LagWatchdog
+from migrations import run_migrations
+from rate_limit import background_requests
+from reconcile import reconcile_players
+from riot_api import RiotApiError, RiotClient
+from snapshots import SnapshotStore, build_snapshot
+
+# Start of the startup, time-to-ready is measured from here
+STARTED_AT = time.monotonic()
+
 status = ['The universe will be mine', 'Are they taunting us!?', '*Kayn Laughs*', 'Peekaboo']
 
-# Setting the riot api key
+# Setting the riot api key, every process started by launcher.py gets its
+# part of the key's rate limits
 api_key = 'RIOT API HERE'
+riot = RiotClient(api_key, processes=shards.process_count())
+
+# Maximum amount of summoners of a single region fetched at the same time by
+# the ranking command
+RANKING_CONCURRENCY = 8
+
+# Seconds between the background ranking refreshes and the maximum age of the
+# refreshed data which the ranking command still accepts
+SNAPSHOT_REFRESH_INTERVAL = 600
+SNAPSHOT_MAX_AGE = 900
+
+# Seconds between the background checks of the summoner names and ids
+RECONCILE_INTERVAL = 3600
+
+# Seconds between the background downloads of the new matches, amount of the
+# matches shown by $recent and the default and maximum range of $winrate
+MATCH_INGEST_INTERVAL = 900
+RECENT_MATCHES = 10
+WINRATE_DAYS = 7
+WINRATE_MAX_DAYS = matches.MATCH_RETENTION_DAYS
+
+# Maximum amount of the summoners added by a single $addmany and the largest
+# attached CSV file it reads, a hundred names fit into a few kilobytes
+BULK_ADD_MAX_PLAYERS = 100
+BULK_ADD_MAX_CSV_BYTES = 16 * 1024
+
+# Range of the LP history command and maximum amount of the shown points
+HISTORY_DAYS = 30
+HISTORY_POINTS = 15
+
+# Default and maximum amount of the summoners shown by the global ranking
+GLOBAL_RANKING_SIZE = 10
+GLOBAL_RANKING_MAX_SIZE = 100
+
+# Shards of this process when started by launcher.py. The process owning
+# shard 0 also runs the background work shared by every discord server
+SHARD_COUNT, SHARD_IDS = shards.config()
+RUNS_GLOBAL_TASKS = SHARD_IDS is None or 0 in SHARD_IDS
+
+
+def owns_guild(guild_id):
+    """Tells if the discord server belongs to the shards of this process"""
+    return SHARD_COUNT is None or shards.shard_of(guild_id, SHARD_COUNT) in SHARD_IDS
+
 
 # Setting up the database
-conn = sqlite3.connect('database/summoners.db')
-_cursor = conn.cursor()
+db = Database(DATABASE_PATH)
+db.run_sync(run_migrations)
+db.start()
+
+# Prefix and region of every discord server kept in the memory
+guild_configs = GuildConfigCache(db)
+db.run_sync(guild_configs.load)
+
+# Names and ids of the summoners confirmed by the Riot API
+identities = IdentityCache(db, riot)
+db.run_sync(identities.load)
+
+# Ranking lists of the discord servers of this process
+roster_store = roster.RosterStore(db, owns_guild if SHARD_COUNT is not None else None)
+db.run_sync(roster_store.load)
+DATABASE_READY_AT = time.monotonic()
+
+# Latest ranked entries of every discord server
+snapshots = SnapshotStore(SNAPSHOT_MAX_AGE)
+
+# Rendered pages of the discord server leaderboards
+ranking_pages = renderer.PageCache()
+
+# Ladder of all the tracked summoners of the region
+regional_ladder = leaderboard.RegionalLadder(db)
+
+COMMAND_LATENCY = metrics.registry.histogram('kayn_command_seconds', 'Time of the bot commands by result',
+                                             ('command', 'status'))
+GUILDS = metrics.registry.gauge('kayn_guilds', 'Discord servers the bot is in')
+PLAYERS = metrics.registry.gauge('kayn_players', 'Tracked summoners and their ranking list entries', ('kind',))
+RIOT_CACHE = metrics.registry.gauge('kayn_riot_cache', 'Counters of the Riot API caches', ('cache', 'stat'))
+STARTUP = metrics.registry.gauge('kayn_startup_seconds', 'Duration of the startup phases', ('phase',))
+
+# Extensions of the cogs directory, loaded with the first command the bot
+# doesn't know yet, so they don't slow down the startup
+LAZY_EXTENSIONS = [f'cogs.{filename[:-3]}' for filename in sorted(os.listdir('./cogs')) if filename.endswith('.py')]
+
+# Measures the event loop lag and records the commands which blocked it
+lag_watchdog = LagWatchdog()
 
 
 def is_it_owner(ctx):
@@ -46,101 +149,115 @@ def get_prefix(client, message):
     Returns:
         str: discord server id converted into the string
     """
-    _cursor.execute(f"SELECT * FROM server_config WHERE guild_id = :guild_id", {'guild_id': str(message.guild.id)})
+    if message.guild is None:
+        return DEFAULT_PREFIX
 
-    print(str(message.guild.id))
-    server_prefix = _cursor.fetchone()[2]
+    return guild_configs.prefix(str(message.guild.id))
 
-    return server_prefix
 
-
-def assigning_json_values(player_ranked_data, summoner_current_name, index, list_of_players, summoners):
-    """Returns the custom made list which is created by the riot api data usage
+async def fetch_league_entries(player, semaphores):
+    """Returns the ranked entries of a single tracked summoner from its own
+    region. Every region has its own semaphore, just like its own session and
+    rate limits in RiotClient, so a slow or throttled region doesn't hold up
+    the summoners of the other regions
 
     Parameters:
-        :param index: index responsible for reading the certain keys
-        :param player_ranked_data: Downloaded and decoded Riot Api data
-        :param summoners: custom list creator
-        :param list_of_players: custom list
-        :param summoner_current_name:
+        player: Player: tracked summoner
+        semaphores: dict: platform id mapped to the concurrency bound of the
+        region, filled on first use
 
     Returns:
-        list: custom made list for bot purpose usage
+        list: ranked entries downloaded from the Riot API
     """
-    summoner_name = summoner_current_name
-    tier = player_ranked_data[index]['tier']
-    rank = player_ranked_data[index]['rank']
-    league_points = player_ranked_data[index]['leaguePoints']
-    wins = player_ranked_data[index]['wins']
-    losses = player_ranked_data[index]['losses']
-
-    return list_of_players.append(summoners(summoner_name, tier, rank, league_points, wins, losses))
-
-
-def check_if_name_changed(encrypted_summoner_id, guild_id):
-    try:
-        _cursor.execute("SELECT * FROM server_config WHERE guild_id = :guild_id", {'guild_id': guild_id})
-
-        region = _cursor.fetchone()[1]
+    semaphore = semaphores.get(player.region)
+    if semaphore is None:
+        semaphore = semaphores[player.region] = asyncio.Semaphore(RANKING_CONCURRENCY)
+    async with semaphore:
+        return await riot.league_entries(player.region, player.riot_id)
 
-        api_check_name = f'https://{region}.api.riotgames.com/lol/summoner/v4/summoners/' \
-                         f'{encrypted_summoner_id}?api_key={api_key}'
 
-        check_name = urllib.request.urlopen(api_check_name)
+async def collect_snapshot(guild_id):
+    """Downloads the ranked entries of every player from the discord server
+    list, each of them from its own region, and stores them as the latest
+    snapshot of the server
 
-        check_name_data = json.loads(check_name.read())
-
-        _cursor.execute("SELECT * FROM summoners WHERE riot_id = :riot_id", {'riot_id': check_name_data['id']})
-
-        current_summoner_name = _cursor.fetchone()[0]
-        current_summoner_region = _cursor.fetchone()[3]
-
-        if check_name_data['name'] != current_summoner_name and current_summoner_region == region:
-            with conn:
-                _cursor.execute("UPDATE summoners SET summoner_name = :new_name WHERE summoner_name = :summ_name",
-                                {'new_name': check_name_data['name'], 'summ_name': current_summoner_name})
-        else:
-            pass
-    except Exception as err:
-        print(err)
-        print("Something went wrong with refreshing the summoner name")
-
-
-def check_if_riot_id_changed(summoner_name, guild_id):
-    try:
-        _cursor.execute("SELECT * FROM server_config WHERE guild_id = :guild_id", {'guild_id': guild_id})
-
-        region = _cursor.fetchone()[1]
+    Parameters:
+        guild_id: str: discord server id
 
-        parsed_summoner_name = urllib.parse.quote(summoner_name)
+    Returns:
+        Snapshot: freshly downloaded ranked entries
+    """
+    semaphores = {}
+    snapshot = await build_snapshot(
+        roster_store.players(guild_id),
+        lambda player: fetch_league_entries(player, semaphores)
+    )
+    snapshots.put(guild_id, snapshot)
+    await db.write(history.record_snapshot, snapshot)
+    await db.write(leaderboard.store_entries, snapshot)
+
+    return snapshot
+
+
+class KaynBot(commands.AutoShardedBot):
+    """Bot class which additionally measures the commands and closes the Riot
+    API sessions, the metrics endpoint and the database threads on shutdown"""
+    metrics_server = None
+    ready_at = None
+    lazy_extensions = LAZY_EXTENSIONS
+
+    def load_lazy_extensions(self):
+        """Loads every extension of the cogs directory which was not tried
+        yet. An extension unloaded by the owner is not loaded again"""
+        extensions, self.lazy_extensions = self.lazy_extensions, []
+        for extension in extensions:
+            if extension in self.extensions:
+                continue
+            try:
+                self.load_extension(extension)
+            except commands.ExtensionError as err:
+                print(err)
 
-        api_check_riot_id = f'https://{region}.api.riotgames.com/lol/summoner/v4/summoners/' \
-                            f'by-name/{parsed_summoner_name}?api_key={api_key}'
+    async def invoke(self, ctx):
+        if ctx.command is None and ctx.invoked_with and self.lazy_extensions:
+            self.load_lazy_extensions()
+            ctx.command = self.all_commands.get(ctx.invoked_with)
 
-        if api_check_riot_id == 0:
+        if ctx.command is None:
+            await super().invoke(ctx)
             return
 
-        check_riot_id = urllib.request.urlopen(api_check_riot_id)
-
-        check_riot_id_data = json.loads(check_riot_id.read())
-
-        _cursor.execute("SELECT * FROM summoners WHERE summoner_name = :summoner_name",
-                        {'summoner_name': check_riot_id_data['name']})
-
-        current_riot_id = _cursor.fetchone()[1]
-
-        if check_riot_id_data['id'] != current_riot_id:
-            with conn:
-                _cursor.execute("UPDATE summoners SET riot_id = :new_riot_id WHERE riot_id = :riot_id",
-                                {'new_riot_id': check_riot_id_data['id'], 'riot_id': current_riot_id})
-        else:
-            pass
-    except Exception as err:
-        print(err)
-        print("Something went wrong with refreshing the riot id")
-
-
-client = commands.Bot(command_prefix=get_prefix, help_command=None)
+        started = time.perf_counter()
+        with lag_watchdog.track(ctx.command.qualified_name, str(ctx.guild.id) if ctx.guild else None):
+            await super().invoke(ctx)
+        COMMAND_LATENCY.observe(time.perf_counter() - started, ctx.command.qualified_name,
+                                'error' if ctx.command_failed else 'ok')
+
+    async def collect_metrics(self):
+        """Updates the gauges which are computed only when the metrics are
+        read"""
+        GUILDS.set(len(self.guilds))
+        players, entries = await db.fetchone("SELECT (SELECT COUNT(*) FROM players), "
+                                             "(SELECT COUNT(*) FROM guild_players)")
+        PLAYERS.set(players, 'players')
+        PLAYERS.set(entries, 'ranking_list_entries')
+        for cache, stats in riot.cache_stats().items():
+            for stat, value in stats.items():
+                RIOT_CACHE.set(value, cache, stat)
+
+    async def close(self):
+        lag_watchdog.stop()
+        await riot.close()
+        if self.metrics_server is not None:
+            await self.metrics_server.cleanup()
+        await super().close()
+        db.close()
+
+
+client = KaynBot(command_prefix=get_prefix, help_command=None, shard_count=SHARD_COUNT, shard_ids=SHARD_IDS)
+client.riot = riot
+client.db = db
+client.lag_watchdog = lag_watchdog
 
 
 # client.event section
@@ -152,31 +269,7 @@ async def on_guild_join(guild):
     Parameters:
         guild: object: Responsible for reading discord server data
     """
-    try:
-        _cursor.execute("""CREATE TABLE summoners (
-                    summoner_name text,
-                    riot_id text,
-                    discord_server text,
-                    riot_region text
-                )""")
-
-        conn.commit()
-    except sqlite3.OperationalError:
-        print("Database already exists")
-    try:
-        _cursor.execute("""CREATE TABLE server_config (
-                    guild_id text,
-                    region text,
-                    prefix text
-                )""")
-
-        conn.commit()
-    except sqlite3.OperationalError:
-        print("Database already exists")
-
-    with conn:
-        _cursor.execute("INSERT INTO server_config VALUES (:guild_id, :region, :prefix)",
-                  {'guild_id': str(guild.id),'region': 'eun1', 'prefix': '$'})
+    await guild_configs.add_guild(str(guild.id))
 
 
 @client.event
@@ -187,19 +280,64 @@ async def on_guild_remove(guild):
     Parameters:
         guild: object: Responsible for reading discord server data
     """
-    with conn:
-        _cursor.execute("DELETE FROM server_config WHERE guild_id = :guild_id", {'guild_id': str(guild.id)})
-        _cursor.execute("DELETE FROM summoners WHERE discord_server = :discord_server", {'discord_server': str(guild.id)})
+    await guild_configs.remove_guild(str(guild.id))
+    snapshots.forget(str(guild.id))
+    await roster_store.delete_guild(str(guild.id))
 
 
 @client.event
 async def on_ready():
     """Executing on bot startup. Setting base of the server."""
     await client.change_presence(status=discord.Status.online, activity=discord.Game('Python Project'), afk=False)
-    change_status.start()
+    if client.ready_at is None:
+        client.ready_at = time.monotonic()
+        await sync_guilds()
+        synced_at = time.monotonic()
+
+        phases = {'database': DATABASE_READY_AT - STARTED_AT, 'connect': client.ready_at - DATABASE_READY_AT,
+                  'guild_sync': synced_at - client.ready_at, 'total': synced_at - STARTED_AT}
+        for phase, seconds in phases.items():
+            STARTUP.set(round(seconds, 3), phase)
+        print(f"Ready in {phases['total']:.2f}s (database {phases['database']:.2f}s, "
+              f"connect {phases['connect']:.2f}s, guild sync {phases['guild_sync']:.2f}s)")
+
+    if not change_status.is_running():
+        change_status.start()
+    lag_watchdog.start()
+    if not refresh_snapshots.is_running():
+        refresh_snapshots.start()
+    if not publish_shard_stats.is_running():
+        publish_shard_stats.start()
+    if RUNS_GLOBAL_TASKS and not roll_up_history.is_running():
+        roll_up_history.start()
+    if RUNS_GLOBAL_TASKS and not reconcile_summoners.is_running():
+        reconcile_summoners.start()
+    if RUNS_GLOBAL_TASKS and not ingest_match_history.is_running():
+        ingest_match_history.start()
+    if not RUNS_GLOBAL_TASKS and not reload_roster.is_running():
+        reload_roster.start()
+    if client.metrics_server is None and metrics.METRICS_PORT:
+        client.metrics_server = await metrics.start_server(client.collect_metrics)
+        print(f'Metrics served on {metrics.METRICS_HOST}:{metrics.METRICS_PORT}')
     print('Bot connected.')
 
 
+async def sync_guilds():
+    """Adds the discord servers joined while the bot was offline and deletes
+    the ones it left, only the servers of the shards of this process"""
+    owns = None
+    if SHARD_COUNT is not None:
+        def owns(guild_id):
+            return shards.shard_of(guild_id, SHARD_COUNT) in SHARD_IDS
+
+    added, removed = await guild_configs.sync([str(guild.id) for guild in client.guilds], owns)
+    for guild_id in removed:
+        snapshots.forget(guild_id)
+        roster_store.drop_guild(guild_id)
+    if added or removed:
+        print(f'Added {len(added)} and removed {len(removed)} discord servers changed while offline')
+
+
 # tasks.loop section
 @tasks.loop(seconds=3600)
 async def change_status():
@@ -207,6 +345,76 @@ async def change_status():
     await client.change_presence(activity=discord.Game(choice(status)))
 
 
+@tasks.loop(seconds=SNAPSHOT_REFRESH_INTERVAL)
+async def refresh_snapshots():
+    """Refreshes the ranking snapshot of every discord server. Servers are
+    spread over the first half of the interval so the API key never gets a
+    burst of requests"""
+    guild_ids = roster_store.guilds()
+
+    for guild_id in guild_ids:
+        try:
+            with lag_watchdog.track('refresh_snapshots', guild_id), background_requests():
+                await collect_snapshot(guild_id)
+        except Exception as err:
+            print(err)
+            print("Something went wrong with refreshing the ranking snapshot")
+
+        await asyncio.sleep(SNAPSHOT_REFRESH_INTERVAL / 2 / len(guild_ids))
+
+
+@tasks.loop(seconds=shards.SHARD_STATS_INTERVAL)
+async def publish_shard_stats():
+    """Publishes the counters of the shards of this process for the owner
+    commands of every process"""
+    guilds = {shard_id: 0 for shard_id in client.shards}
+    for guild in client.guilds:
+        guilds[guild.shard_id] = guilds.get(guild.shard_id, 0) + 1
+    await db.write(shards.store_shard_stats, client.shard_count,
+                   [(shard_id, guilds[shard_id], shard.latency) for shard_id, shard in client.shards.items()])
+
+
+@tasks.loop(seconds=3600)
+async def roll_up_history():
+    """Rolls the old LP history points up into hourly and daily points every
+    hour"""
+    await db.write(history.roll_up)
+
+
+@tasks.loop(seconds=RECONCILE_INTERVAL)
+async def reconcile_summoners():
+    """Fixes the changed names and ids of every tracked summoner"""
+    try:
+        with lag_watchdog.track('reconcile_summoners'), background_requests():
+            changes = await reconcile_players(db, identities)
+        roster_store.rename(changes)
+        print(f"Summoner reconciliation changed {len(changes)} players")
+    except Exception as err:
+        print(err)
+        print("Something went wrong with the summoner reconciliation")
+
+
+@tasks.loop(seconds=RECONCILE_INTERVAL)
+async def reload_roster():
+    """Reads the ranking lists again, so the processes which don't run the
+    reconciliation see the renamed summoners"""
+    if not await roster_store.reload():
+        print("Ranking lists changed during the reload, trying again next time")
+
+
+@tasks.loop(seconds=MATCH_INGEST_INTERVAL)
+async def ingest_match_history():
+    """Downloads the matches every tracked summoner played since the last
+    run"""
+    try:
+        with lag_watchdog.track('ingest_match_history'), background_requests():
+            stored = await matches.ingest_matches(db, riot, identities)
+        print(f"Match history ingestion stored {stored} summaries")
+    except Exception as err:
+        print(err)
+        print("Something went wrong with the match history ingestion")
+
+
 # client.command section
 @client.command()
 async def ping(ctx):
@@ -223,14 +431,27 @@ async def help(ctx):
     """
     embed = discord.Embed(title='Commands', color=0x00ff00)
     embed.add_field(name='$prefix {ctx}', value='ONLY ADMIN Change the prefix of the bot on your server.', inline=False)
-    embed.add_field(name='$region {ctx}', value='ONLY ADMIN Changes the region of your league ranking.', inline=False)
+    embed.add_field(name='$region {ctx}', value='ONLY ADMIN Changes the region in which new players are looked up.',
+                    inline=False)
     embed.add_field(name='$showregion', value='Shows the currently chosen region for your bot.', inline=False)
-    embed.add_field(name='$add {ctx}', value='ONLY ADMIN Adding the player to the ranking list.', inline=False)
+    embed.add_field(name='$add {ctx}', value='ONLY ADMIN Adding the player to the ranking list, ex. $add euw:name '
+                                             'adds the player from another region.', inline=False)
+    embed.add_field(name='$addmany {ctx}, {ctx}', value='ONLY ADMIN Adding many players at once, names separated '
+                                                        'by commas or in the attached CSV file.', inline=False)
     embed.add_field(name='$del {ctx}', value='ONLY ADMIN Deleting the player from the ranking list.', inline=False)
     embed.add_field(name='$delall', value='ONLY ADMIN Deletes all the players from your server list.', inline=False)
     embed.add_field(name='$showall', value='Shows all players from your server list.', inline=False)
     embed.add_field(name='$ranking solo/flex', value='Displays the ranking among the players '
                                                      'added to your server list.', inline=False)
+    embed.add_field(name='$globalranking {region} solo/flex', value='Displays the ranking among the players '
+                                                                   'added on every server in the region.',
+                    inline=False)
+    embed.add_field(name='$history {ctx} solo/flex', value='Shows the LP history of the player from '
+                                                           'your server list.', inline=False)
+    embed.add_field(name='$recent {ctx}', value='Shows the latest matches of the player from your server list.',
+                    inline=False)
+    embed.add_field(name='$winrate {days}', value='Shows the win rate of the players from your server list in the '
+                                                  'last days.', inline=False)
     embed.add_field(name='$gamemode', value='If you dont know which gamemode to play why not to ask the bot?',
                     inline=False)
     embed.set_thumbnail(url="https://static.wikia.nocookie.net/leagueoflegends/images/a/a5/"
@@ -249,77 +470,34 @@ async def prefix(ctx, new_prefix):
         ctx, which is the Context as the first one
         new_prefix: object: a given new prefix for invoking the bot commands
     """
-    with conn:
-        if len(new_prefix) > 1:
-            await ctx.send('I support only single symbol prefixes')
-        else:
-            _cursor.execute("UPDATE server_config SET prefix = :prefix WHERE guild_id = :guild_id",
-            {'guild_id': str(ctx.guild.id), 'prefix': new_prefix})
+    if len(new_prefix) > 1:
+        await ctx.send('I support only single symbol prefixes')
+    else:
+        await guild_configs.set_prefix(str(ctx.guild.id), new_prefix)
 
-            await ctx.send(f'Prefix changed to: \'{new_prefix}\'')
+        await ctx.send(f'Prefix changed to: \'{new_prefix}\'')
 
 
 @client.command(aliases=['region', 'changeregion'])
 @has_permissions(administrator=True)
 async def change_region(ctx, new_region):
-    """Bot command for changing the region for working with riot api
+    """Bot command for changing the default region of the discord server. New
+    players are looked up in this region, the players already on the list
+    keep their own regions
 
     Parameters:
         ctx: object: A command must always have at least one parameter,
         ctx, which is the Context as the first one
         new_region: object: a given new region for responding with the riot api
     """
-    correct_region = False
-
-    if new_region.lower() == 'eune':
-        new_region = 'eun1'
-        correct_region = True
-        await ctx.send('Region changed to Europe North & East')
-    elif new_region.lower() == 'euw':
-        new_region = 'euw1'
-        correct_region = True
-        await ctx.send('Region changed to Europe West')
-    elif new_region.lower() == 'ru':
-        correct_region = True
-        await ctx.send('Region changed to Russia')
-    elif new_region.lower() == 'br':
-        new_region = 'br1'
-        correct_region = True
-        await ctx.send('Region changed to Brazil')
-    elif new_region.lower() == 'tr':
-        new_region = 'tr1'
-        correct_region = True
-        await ctx.send('Region changed to Turkey')
-    elif new_region.lower() == 'oce':
-        new_region = 'oc1'
-        correct_region = True
-        await ctx.send('Region changed to Oceania')
-    elif new_region.lower() == 'las':
-        new_region = 'la2'
-        correct_region = True
-        await ctx.send('Region changed to Latin America South')
-    elif new_region.lower() == 'lan':
-        new_region = 'la1'
-        correct_region = True
-        await ctx.send('Region changed to Latin America North')
-    elif new_region.lower() == 'kr':
-        correct_region = True
-        await ctx.send('Region changed to Korea')
-    elif new_region.lower() == 'na':
-        new_region = 'na1'
-        correct_region = True
-        await ctx.send('Region changed to North America')
-    elif new_region.lower() == 'jp':
-        new_region = 'jp1'
-        correct_region = True
-        await ctx.send('Region changed to Japan')
-    else:
+    region = regions.find(new_region)
+
+    if region is None:
         await ctx.send("This region is not usable within my commands or it does not exist")
+        return
 
-    if correct_region:
-        with conn:
-            _cursor.execute("UPDATE server_config SET region = :region WHERE guild_id = :guild_id",
-             {'guild_id': str(ctx.guild.id),'region': new_region})
+    await guild_configs.set_region(str(ctx.guild.id), region.platform)
+    await ctx.send(f'Region changed to {region.name}')
 
 
 @client.command(aliases=['showreg', 'showregion'])
@@ -330,40 +508,17 @@ async def show_reg(ctx):
     ctx, which is the Context as the first one
     :return: returns the message send by the bot
     """
-    _cursor.execute("SELECT * FROM server_config WHERE guild_id = :guild_id", {'guild_id': str(ctx.guild.id)})
-
-    region_text = _cursor.fetchone()[1]
-
-    if region_text.lower() == 'eun1':
-        region_text = 'EUNE'
-    elif region_text.lower() == 'euw1':
-        region_text = 'EUW'
-    elif region_text.lower() == 'ru':
-        region_text = 'RU'
-    elif region_text.lower() == 'br1':
-        region_text = 'BR'
-    elif region_text.lower() == 'tr1':
-        region_text = 'TR'
-    elif region_text.lower() == 'oc1':
-        region_text = 'OCE'
-    elif region_text.lower() == 'la2':
-        region_text = 'LAS'
-    elif region_text.lower() == 'la1':
-        region_text = 'LAN'
-    elif region_text.lower() == 'kr':
-        region_text = 'KR'
-    elif region_text.lower() == 'na1':
-        region_text = 'NA'
-    elif region_text.lower() == 'jp1':
-        region_text = 'JP'
-
-    await ctx.send(f"Currently set region: {region_text}")
+    region = regions.by_platform(guild_configs.region(str(ctx.guild.id)))
+
+    await ctx.send(f"Currently set region: {region.label}")
 
 
 @client.command(aliases=['addplayer', 'add'])
 @has_permissions(administrator=True)
 async def add_player(ctx, *, member: str):
-    """Bot command responsible for adding the players to the ranking list
+    """Bot command responsible for adding the players to the ranking list. The
+    player is looked up in the region of the discord server, unless the name
+    starts with another region ex. euw:name
 
     Parameters:
         ctx: object: A command must always have at least one parameter,
@@ -371,38 +526,23 @@ async def add_player(ctx, *, member: str):
         member: str: name of the player who gonna be considered by the bot for
         a potential ranking command participant
     """
-    try:
-        _cursor.execute(f"SELECT * FROM server_config WHERE guild_id = :guild_id", {'guild_id': str(ctx.guild.id)})
+    region, member = regions.split_region(member, guild_configs.region(str(ctx.guild.id)))
 
-        region = _cursor.fetchone()[1]
-
-        parsed_member = urllib.parse.quote(member)
+    if region is None:
+        await ctx.send("This region is not usable within my commands or it does not exist")
+        return
 
-        web_riot_api_id = f'https://{region}.api.riotgames.com/lol/summoner/v4/summoners/by-name/{parsed_member}' \
-                          f'?api_key={api_key}'
-        data_id = urllib.request.urlopen(web_riot_api_id).read()
-        summoner_data = json.loads(data_id)
+    try:
+        summoner_data = await identities.by_name(region, member)
 
         riot_id = summoner_data['id']
+        summoner_name = summoner_data['name']
 
-        _cursor.execute("SELECT * FROM summoners WHERE discord_server = :guild_id", {'guild_id': str(ctx.guild.id)})
+        player_added = await roster_store.add(str(ctx.guild.id), summoner_name, riot_id, region)
 
-        summoners = _cursor.fetchall()
-
-        copy_id = True
-
-        for summoner in summoners:
-            if summoner[1] == riot_id and summoner[3] == region:
-                copy_id = False
-        if copy_id:
-            with conn:
-                _cursor.execute("""INSERT INTO summoners 
-                VALUES (:summoner_name, :riot_id, :discord_server, :riot_server)""",
-                {'summoner_name': member, 'riot_id': riot_id,
-                 'discord_server': str(ctx.guild.id), 'riot_server': region})
-
-        if copy_id:
-            await ctx.send(f'Player added to the ranking list: \'{member}\'')
+        if player_added:
+            snapshots.remove(str(ctx.guild.id))
+            await ctx.send(f'Player added to the ranking list: \'{summoner_name}\'')
         else:
             await ctx.send('Player is already added to the ranking')
 
@@ -412,10 +552,113 @@ async def add_player(ctx, *, member: str):
             await ctx.send('Some data is incorrect. Check the user name or the region.')
 
 
+def split_names(text):
+    """Returns the summoner names separated by commas or new lines, without
+    the duplicates differing only by the letter case"""
+    names = {}
+    for line in text.splitlines():
+        for name in line.split(','):
+            name = name.strip()
+            if name:
+                names.setdefault(name.lower(), name)
+    return list(names.values())
+
+
+async def read_csv_names(attachment):
+    """Returns the summoner names from the first column of the CSV file,
+    skipping the header"""
+    content = (await attachment.read()).decode('utf-8-sig', errors='replace')
+    names = [row[0].strip() for row in csv.reader(content.splitlines()) if row and row[0].strip()]
+    if names and names[0].lower() in ('name', 'summoner', 'summoner name', 'summoner_name'):
+        names = names[1:]
+    return names
+
+
+@client.command(aliases=['addmany'])
+@has_permissions(administrator=True)
+async def add_many(ctx, *, members: str = ''):
+    """Bot command responsible for adding many players to the ranking list at
+    once. Names are separated by commas or given in the attached CSV file,
+    each of them can start with its region ex. euw:name. They are looked up
+    concurrently and added in a single transaction
+
+    Parameters:
+        ctx: object: A command must always have at least one parameter,
+        ctx, which is the Context as the first one
+        members: str: names of the players separated by commas
+    """
+    guild_id = str(ctx.guild.id)
+    default_region = guild_configs.region(guild_id)
+
+    usage = 'Please give the names separated by commas or attach the CSV file with them. ex: $addmany name1, name2'
+
+    text = members
+    for attachment in ctx.message.attachments:
+        # Screenshots and other files would turn into garbage names, each
+        # of them sent to the Riot API
+        if not attachment.filename.lower().endswith('.csv') or attachment.size > BULK_ADD_MAX_CSV_BYTES:
+            await ctx.send(usage)
+            return
+        text += '\n' + '\n'.join(await read_csv_names(attachment))
+    names = split_names(text)
+
+    if not names:
+        await ctx.send(usage)
+        return
+    if len(names) > BULK_ADD_MAX_PLAYERS:
+        await ctx.send(f'Up to {BULK_ADD_MAX_PLAYERS} players can be added at once.')
+        return
+
+    semaphores = {}
+
+    async def look_up(name):
+        region, summoner_name = regions.split_region(name, default_region)
+        if region is None:
+            return None
+        semaphore = semaphores.get(region)
+        if semaphore is None:
+            semaphore = semaphores[region] = asyncio.Semaphore(RANKING_CONCURRENCY)
+        async with semaphore:
+            return await identities.by_name(region, summoner_name)
+
+    results = await asyncio.gather(*(look_up(name) for name in names), return_exceptions=True)
+
+    found = {}
+    report = {}
+    for name, summoner_data in zip(names, results):
+        if summoner_data is None:
+            report[name] = 'unknown region'
+        elif isinstance(summoner_data, RiotApiError) and summoner_data.status == 404:
+            report[name] = 'not found in the region'
+        elif isinstance(summoner_data, Exception):
+            print(summoner_data)
+            report[name] = 'lookup failed, try again later'
+        elif (summoner_data['id'], summoner_data['region']) in found:
+            report[name] = f"same summoner as {found[(summoner_data['id'], summoner_data['region'])][0]}"
+        else:
+            found[(summoner_data['id'], summoner_data['region'])] = (summoner_data['name'], name)
+
+    if found:
+        already_added = await roster_store.add_many(
+            guild_id, [(summoner_name, riot_id, region) for (riot_id, region), (summoner_name, _) in found.items()])
+        for player, (summoner_name, name) in found.items():
+            report[name] = 'already on the list' if player in already_added else None
+        if len(already_added) < len(found):
+            snapshots.remove(guild_id)
+
+    added = sum(1 for result in report.values() if result is None)
+    rows = [f"{':white_check_mark:' if report[name] is None else ':x:'} {name}"
+            f"{'' if report[name] is None else ' - ' + report[name]}\n" for name in names]
+    embeds = renderer.build_embeds(renderer.paginate(rows), f'Added {added} of {len(names)} players')
+    await renderer.send_paginated(ctx, embeds)
+
+
 @client.command(aliases=['delplayer', 'del'])
 @has_permissions(administrator=True)
 async def del_player(ctx, *, member: str):
-    """Bot command responsible for deleting the players from the ranking list
+    """Bot command responsible for deleting the players from the ranking list.
+    The name can start with the region ex. euw:name, otherwise the player of
+    that name is deleted from every region of the list
 
     Parameters:
         ctx: object: A command must always have at least one parameter,
@@ -423,28 +666,22 @@ async def del_player(ctx, *, member: str):
         member: str: name of the player who gonna be considered by the bot for
         a potential ranking command participant
     """
-    _cursor.execute(f"SELECT * FROM server_config WHERE guild_id = :guild_id", {'guild_id': str(ctx.guild.id)})
-
-    region = _cursor.fetchone()[1]
+    region, summoner_name = regions.split_region(member, None)
 
-    _cursor.execute("SELECT * FROM summoners WHERE discord_server = :guild_id", {'guild_id': str(ctx.guild.id)})
-
-    data = _cursor.fetchall()
+    if region is None and ':' in member:
+        await ctx.send("This region is not usable within my commands or it does not exist")
+        return
+    member = summoner_name
 
-    player_deleted = False
+    deleted_players = await roster_store.delete(str(ctx.guild.id), member, region)
 
-    for elem in data:
-        if elem[0].lower() == member.lower() and elem[2] == str(ctx.guild.id):
-            with conn:
-                _cursor.execute("""DELETE FROM summoners WHERE summoner_name = :summoner_name 
-                AND riot_region = :riot_region""", {'summoner_name': member, 'riot_region': region})
-                player_deleted = True
-                break
+    if deleted_players:
+        snapshots.remove(str(ctx.guild.id))
 
-    if not player_deleted:
+    if not deleted_players:
         await ctx.send('Player couldn\'t be deleted from the ranking list')
     else:
-        await ctx.send(f"Player \'{member}\' successfully deleted from the ranking list")
+        await ctx.send(f"Player \'{deleted_players[0].summoner_name}\' successfully deleted from the ranking list")
 
 
 @client.command(aliases=['delall', 'delallplayers'])
@@ -457,17 +694,10 @@ async def del_all_players(ctx):
         ctx: object: A command must always have at least one parameter,
         ctx, which is the Context as the first one
     """
+    player_deleted = await roster_store.delete_guild(str(ctx.guild.id)) != 0
 
-    _cursor.execute("SELECT * FROM summoners WHERE discord_server = :guild_id", {'guild_id': str(ctx.guild.id)})
-
-    data = _cursor.fetchall()
-
-    player_deleted = False
-
-    if len(data) != 0:
-        with conn:
-            _cursor.execute("DELETE FROM summoners WHERE discord_server = :guild_id", {'guild_id': str(ctx.guild.id)})
-            player_deleted = True
+    if player_deleted:
+        snapshots.remove(str(ctx.guild.id))
 
     if not player_deleted:
         await ctx.send('Players couldn\'t be deleted from the ranking list')
@@ -484,52 +714,15 @@ async def show_players(ctx):
         ctx: object: A command must always have at least one parameter,
         ctx, which is the Context as the first one
     """
-    _cursor.execute("SELECT * FROM summoners WHERE discord_server = :guild_id", {'guild_id': str(ctx.guild.id)})
-
-    data = _cursor.fetchall()
-
-    summoners_text = ''
-    region = ''
-    empty_list = True
-
-    if len(data) != 0:
-        for i, elem in enumerate(data):
-            i += 1
-            parsed_summoner_name = urllib.parse.quote(elem[0])
-            check_if_name_changed(elem[1], str(ctx.guild.id))
-            if elem[3].lower() == 'eun1':
-                region = 'EUNE'
-            elif elem[3].lower() == 'euw1':
-                region = 'EUW'
-            elif elem[3].lower() == 'ru':
-                region = 'RU'
-            elif elem[3].lower() == 'br1':
-                region = 'BR'
-            elif elem[3].lower() == 'tr1':
-                region = 'TR'
-            elif elem[3].lower() == 'oc1':
-                region = 'OCE'
-            elif elem[3].lower() == 'la2':
-                region = 'LAS'
-            elif elem[3].lower() == 'la1':
-                region = 'LAN'
-            elif elem[3].lower() == 'kr':
-                region = 'KR'
-            elif elem[3].lower() == 'na1':
-                region = 'NA'
-            elif elem[3].lower() == 'jp1':
-                region = 'JP'
-            empty_list = False
-            summoners_text += f"{i}. Summoner name: [{elem[0]}](https://eune.op.gg/summoner/userName=" \
-                              f"{parsed_summoner_name}) - Region: **{region}**\n"
-
-    embed = discord.Embed(color=0x0080FF)
-    embed.add_field(name='List of players', value=summoners_text, inline=False)
-
-    if not empty_list:
-        await ctx.send(embed=embed)
-    else:
+    players = roster_store.players(str(ctx.guild.id))
+
+    if not players:
         await ctx.send("List of players is empty")
+        return
+
+    # Long lists don't fit into a single embed field, so they get pages
+    embeds = renderer.build_embeds(renderer.paginate(renderer.player_rows(players)), 'List of players')
+    await renderer.send_paginated(ctx, embeds)
 
 
 @client.command()
@@ -542,124 +735,47 @@ async def ranking(ctx, rankType: str):
          Context as the first one
         :param rankType: specifying for the command which ranking we want to check
     """
-    class Summoners:
-        """Class responsible for creating the custom list which is helping us
-        displaying the user data from league of legends
-        """
-        def __init__(self, summoner_name, tier, rank, league_points, wins, losses):
-            self.summoner_name = summoner_name
-            self.tier = tier
-            self.rank = rank
-            self.league_points = league_points
-            self.wins = wins
-            self.losses = losses
-
-        def __repr__(self):
-            return self.summoner_name + self.tier + self.rank + str(self.league_points) + self.wins + self.losses
-
     if rankType == "solo" or rankType == "flex":
         try:
 
-            _cursor.execute("SELECT * FROM server_config WHERE guild_id = :guild_id", {'guild_id': str(ctx.guild.id)})
-
-            region = _cursor.fetchone()[1]
-
-            _cursor.execute("SELECT * FROM summoners WHERE discord_server = :guild_id", {'guild_id': str(ctx.guild.id)})
-
-            data = _cursor.fetchall()
-
-            list_of_players = []
-
-            if data != 0:
-                for summoners_data in data:
-                    if summoners_data[2] == str(ctx.guild.id) and summoners_data[3] == region:
-
-                        encrypted_summoner_id = summoners_data[1]
-
-                        api_ranking = f'https://{region}.api.riotgames.com/lol/league/v4/entries/by-summoner/' \
-                                      f'{encrypted_summoner_id}?api_key={api_key}'
-
-                        player_ranked = urllib.request.urlopen(api_ranking)
+            snapshot = snapshots.fresh(str(ctx.guild.id))
 
-                        player_ranked_data = json.loads(player_ranked.read())
+            if snapshot is None:
+                snapshot = await collect_snapshot(str(ctx.guild.id))
 
-                        if player_ranked_data != 0:
-                            check_if_name_changed(encrypted_summoner_id, str(ctx.guild.id))
-
-                        summoner_current_name = summoners_data[0]
-
-                        for i in range(len(player_ranked_data)):
-                            if rankType == "solo" and player_ranked_data[i]['queueType'] == "RANKED_SOLO_5x5":
-                                assigning_json_values(
-                                    player_ranked_data,
-                                    summoner_current_name,
-                                    i,
-                                    list_of_players,
-                                    Summoners
-                                )
-                            elif rankType == "flex" and player_ranked_data[i]['queueType'] == "RANKED_FLEX_SR":
-                                assigning_json_values(
-                                    player_ranked_data,
-                                    summoner_current_name,
-                                    i,
-                                    list_of_players,
-                                    Summoners
-                                )
-                            else:
-                                print("This player has no rank in this ranking category")
-            else:
+            if snapshot.players == 0:
                 await ctx.send("There are no players placed in the ranking")
+                return
 
-            order = ["CHALLENGER", "GRANDMASTER", "MASTER", "DIAMOND", "PLATINUM", "GOLD", "SILVER", "BRONZE"]
-            pos = {c: p for (p, c) in enumerate(order)}
-            fully_sorted = sorted(list_of_players, key=lambda elem: (pos[elem.tier], elem.rank, -elem.league_points))
-
-            display_text = ''
-            increment_rank = 0
-
-            for text in fully_sorted:
-                increment_rank += 1
-                win_ratio = round((text.wins * 100) / (text.wins + text.losses))
-                parsed_summoner_name = urllib.parse.quote(text.summoner_name)
-
-                if increment_rank == 1:
-                    display_text += f"{increment_rank}. {text.summoner_name}" \
-                                    f" :first_place: **{text.tier} {text.rank}" \
-                                    f" {text.league_points} LP** - " \
-                                    f"{text.wins}W {text.losses}L" \
-                                    f" / Win Ratio {win_ratio}%\n\n"
-                elif increment_rank == 2:
-                    display_text += f"{increment_rank}. {text.summoner_name}" \
-                                    f" :second_place: **{text.tier} {text.rank}" \
-                                    f" {text.league_points} LP** - " \
-                                    f"{text.wins}W {text.losses}L" \
-                                    f" / Win Ratio {win_ratio}%\n\n"
-                elif increment_rank == 3:
-                    display_text += f"{increment_rank}. {text.summoner_name}" \
-                                    f" :third_place: **{text.tier} {text.rank}" \
-                                    f" {text.league_points} LP** - " \
-                                    f"{text.wins}W {text.losses}L" \
-                                    f" / Win Ratio {win_ratio}%\n\n"
+            board = snapshots.leaderboard(str(ctx.guild.id), rankType)
+
+            if len(board) == 0:
+                if len(snapshot.failed) != 0:
+                    await ctx.send("Couldn't download the ranking data, please try again later")
                 else:
-                    display_text += f"{increment_rank}. {text.summoner_name}" \
-                                    f" **{text.tier} {text.rank}" \
-                                    f" {text.league_points} LP** -" \
-                                    f" {text.wins}W {text.losses}L" \
-                                    f" / Win Ratio {win_ratio}%\n\n"
+                    await ctx.send("None of the players is ranked in this queue")
+                return
 
-                display_text = display_text.replace(text.summoner_name,f'[{text.summoner_name}]'
-                                                    f'(https://eune.op.gg/summoner/userName={parsed_summoner_name})')
+            pages = ranking_pages.pages((str(ctx.guild.id), rankType, board.version), board.top)
 
-            embed = discord.Embed(title=f'Ranked {rankType.capitalize()}', color=0x0080FF)
-            embed.add_field(name='\u200b', value=display_text, inline=False)
-            embed.set_thumbnail(url="https://i.pinimg.com/originals/09/2b/fa/092bfa54aad74ce9ab2de010031731f5.png")
+            footer_text = 'Data as of'
+            if len(snapshot.failed) != 0:
+                footer_text = f"Couldn't refresh: {', '.join(snapshot.failed)} | {footer_text}"
 
-            await ctx.send(embed=embed)
+            embeds = renderer.build_embeds(
+                pages,
+                f'Ranked {rankType.capitalize()}',
+                thumbnail="https://i.pinimg.com/originals/09/2b/fa/092bfa54aad74ce9ab2de010031731f5.png",
+                footer_text=footer_text,
+                timestamp=datetime.datetime.utcfromtimestamp(snapshot.taken_at)
+            )
 
         except Exception as err:
-            if err:
-                print(err)
-                await ctx.send("There might be no players for the ranking list, check your region setting")
+            print(err)
+            await ctx.send("Couldn't prepare the ranking list, please try again later")
+            return
+
+        await renderer.send_paginated(ctx, embeds)
     else:
         await ctx.send("Please put the command in this format ex.: ranking solo")
 
@@ -676,6 +792,164 @@ async def ranking_error(ctx, error):
         await ctx.send("Please put the command in this format ex.: ranking solo")
 
 
+@client.command(aliases=['globalranking'])
+async def global_ranking(ctx, region: str, rank_type: str, amount: int = GLOBAL_RANKING_SIZE):
+    """Bot command responsible for showing the best players of the region
+    added on any discord server
+
+    Parameters:
+        ctx: object: A command must always have at least one parameter,
+        ctx, which is the Context as the first one
+        region: str: short name of the region ex. eune
+        rank_type: str: solo or flex
+        amount: int: amount of the shown players
+    """
+    region = regions.find(region)
+
+    if region is None or rank_type not in ('solo', 'flex'):
+        await ctx.send("Please put the command in this format ex.: globalranking eune solo 10")
+        return
+
+    amount = max(1, min(amount, GLOBAL_RANKING_MAX_SIZE))
+    top_players = await regional_ladder.top(region.platform, rank_type, amount)
+
+    if len(top_players) == 0:
+        await ctx.send("There are no ranked players in this region yet")
+        return
+
+    pages = renderer.paginate(renderer.ranking_rows(top_players))
+    embeds = renderer.build_embeds(pages, f'{region.label} Ranked {rank_type.capitalize()}')
+
+    await renderer.send_paginated(ctx, embeds)
+
+
+@global_ranking.error
+async def global_ranking_error(ctx, error):
+    """Special error message for the global ranking command
+
+    :param ctx: object: A command must always have at least one parameter
+    ctx, which is the Context as the first one
+    :param error: catching the error invoked withing global ranking command
+    """
+    if isinstance(error, (commands.MissingRequiredArgument, commands.BadArgument)):
+        await ctx.send("Please put the command in this format ex.: globalranking eune solo 10")
+
+
+@client.command(name='history')
+async def lp_history(ctx, *, member: str):
+    """Bot command responsible for showing the LP history of the player from
+    the ranking list
+
+    Parameters:
+        ctx: object: A command must always have at least one parameter,
+        ctx, which is the Context as the first one
+        member: str: name of the player optionally followed by solo or flex
+    """
+    rank_type = 'solo'
+    name_parts = member.rsplit(' ', 1)
+    if len(name_parts) == 2 and name_parts[1].lower() in history.QUEUE_IDS:
+        member, rank_type = name_parts[0], name_parts[1].lower()
+
+    players = roster_store.find(str(ctx.guild.id), member)
+
+    if not players:
+        await ctx.send(f"Player \'{member}\' is not on the ranking list")
+        return
+    member, riot_id = players[0].summoner_name, players[0].riot_id
+
+    points = await db.read(history.read_history, riot_id, rank_type, int(time.time()) - HISTORY_DAYS * 24 * 3600)
+
+    if len(points) == 0:
+        await ctx.send(f"There is no {rank_type} history of \'{member}\' yet")
+        return
+
+    history_text = ''
+    for observed_at, tier, rank, league_points, wins, losses in points[-HISTORY_POINTS:]:
+        observed_date = datetime.datetime.utcfromtimestamp(observed_at).strftime('%d.%m %H:%M')
+        history_text += f"{observed_date} - **{tier} {rank} {league_points} LP** - {wins}W {losses}L\n"
+
+    embed = discord.Embed(title=f'{member} - Ranked {rank_type.capitalize()} history', color=0x0080FF)
+    embed.add_field(name='\u200b', value=history_text, inline=False)
+
+    await ctx.send(embed=embed)
+
+
+@client.command()
+async def recent(ctx, *, member: str):
+    """Bot command responsible for showing the latest matches of the player
+    from the ranking list, read from the stored match history
+
+    Parameters:
+        ctx: object: A command must always have at least one parameter,
+        ctx, which is the Context as the first one
+        member: str: name of the player
+    """
+    players = roster_store.find(str(ctx.guild.id), member)
+
+    if not players:
+        await ctx.send(f"Player \'{member}\' is not on the ranking list")
+        return
+    player = players[0]
+
+    recent_matches = await db.read(matches.recent_matches, player.region, player.riot_id, RECENT_MATCHES)
+
+    if len(recent_matches) == 0:
+        await ctx.send(f"There are no matches of \'{player.summoner_name}\' yet")
+        return
+
+    matches_text = ''
+    for game_start, queue_id, champion, win, kills, deaths, assists, duration in recent_matches:
+        game_date = datetime.datetime.utcfromtimestamp(game_start).strftime('%d.%m %H:%M')
+        queue_name = matches.QUEUE_NAMES.get(queue_id, 'Other')
+        matches_text += f"{game_date} - **{'Victory' if win else 'Defeat'}** {champion} {kills}/{deaths}/{assists}" \
+                        f" - {queue_name} {duration // 60}:{duration % 60:02d}\n"
+
+    embed = discord.Embed(title=f'{player.summoner_name} - Recent matches', color=0x0080FF)
+    embed.add_field(name='\u200b', value=matches_text, inline=False)
+
+    await ctx.send(embed=embed)
+
+
+@client.command()
+async def winrate(ctx, days: int = WINRATE_DAYS):
+    """Bot command responsible for showing the win rate of every player from
+    the ranking list in the last days, read from the stored match history
+
+    Parameters:
+        ctx: object: A command must always have at least one parameter,
+        ctx, which is the Context as the first one
+        days: int: amount of the last days
+    """
+    days = max(1, min(days, WINRATE_MAX_DAYS))
+    since = int(time.time()) - days * 24 * 3600
+
+    win_rates = await db.read(matches.guild_win_rates, str(ctx.guild.id), since)
+
+    if len(win_rates) == 0:
+        await ctx.send(f"There are no matches of the players from the last {days} days yet")
+        return
+
+    rows = []
+    for position, (summoner_name, region, wins, games) in enumerate(win_rates, start=1):
+        rows.append(f"{position}. [{summoner_name}]({regions.by_platform(region).profile_url(summoner_name)})"
+                    f" **{round(wins * 100 / games)}%** - {wins}W {games - wins}L\n")
+
+    embeds = renderer.build_embeds(renderer.paginate(rows), f'Win rate of the last {days} days')
+    await renderer.send_paginated(ctx, embeds)
+
+
+@winrate.error
+async def winrate_error(ctx, error):
+    """Special error message for the win rate command
+
+    :param ctx: object: A command must always have at least one parameter
+    ctx, which is the Context as the first one
+    :param error: catching the error invoked withing win rate command
+    """
+    if isinstance(error, commands.BadArgument):
+        await ctx.send("Please put the command in this format ex.: winrate 7")
+
+
 @client.command(aliases=['gamemode'])
 async def game_mode(ctx):
     """Bot command responsible for generating the random answer from the bot
@@ -693,10 +967,12 @@ async def game_mode(ctx):
 # These lines below are responsible to load commands (cogs) for bot owner usage
 @client.command()
 @commands.check(is_it_owner)
-async def load(extension):
+async def load(ctx, extension):
     """Bot command responsible for loading the special owner only commands
 
     Parameters:
+        ctx: object: A command must always have at least one parameter,
+        ctx, which is the Context as the first one
         extension: object: giving the command the extension of the file
     """
     client.load_extension(f'cogs.{extension}')
@@ -704,10 +980,12 @@ async def load(extension):
 
 @client.command()
 @commands.check(is_it_owner)
-async def unload(extension):
+async def unload(ctx, extension):
     """Bot command responsible for unloading the special owner only commands
 
     Parameters:
+        ctx: object: A command must always have at least one parameter,
+        ctx, which is the Context as the first one
         extension: object: giving the command the extension of the file
     """
     client.unload_extension(f'cogs.{extension}')
@@ -715,21 +993,18 @@ async def unload(extension):
 
 @client.command()
 @commands.check(is_it_owner)
-async def reload(extension):
+async def reload(ctx, extension):
     """Bot command responsible for reloading the special owner only commands
 
     Parameters:
+        ctx: object: A command must always have at least one parameter,
+        ctx, which is the Context as the first one
         extension: object: giving the command the extension of the file
     """
     client.unload_extension(f'cogs.{extension}')
     client.load_extension(f'cogs.{extension}')
 
 
-for filename in os.listdir('./cogs'):
-    if filename.endswith('.py'):
-        client.load_extension(f'cogs.{filename[:-3]}')
-
-
 @client.command()
 @commands.check(is_it_owner)
 async def example(ctx):
@@ -0,0 +1,208 @@
+"""
+Match history of the tracked summoners. For every puuid only the match-v5 ids
+newer than the last seen match are fetched, a match played by many tracked
+summoners is downloaded once, and a compact summary row of every tracked
+summoner of the match is stored in match_summaries, which answers $recent and
+$winrate without the Riot API.
+"""
+import asyncio
+import time
+
+import regions
+
+MATCH_CONCURRENCY = 4
+
+# Days of the matches fetched for a summoner seen for the first time, and the
+# days after which the summaries are deleted
+MATCH_BACKFILL_DAYS = 7
+MATCH_RETENTION_DAYS = 90
+
+# Maximum amount of the ids returned by a single match-v5 ids request
+MATCH_IDS_PAGE = 100
+
+QUEUE_NAMES = {400: 'Normal Draft', 420: 'Ranked Solo', 430: 'Normal Blind', 440: 'Ranked Flex', 450: 'ARAM',
+               700: 'Clash', 900: 'URF', 1700: 'Arena'}
+
+
+def read_cursors(conn):
+    """Returns the puuids mapped to the (match_id, game_start) of their last
+    seen match"""
+    return {puuid: (match_id, game_start)
+            for puuid, match_id, game_start in conn.execute("SELECT puuid, last_match_id, last_game_start "
+                                                            "FROM match_cursors")}
+
+
+def stored_matches(conn, puuid, match_ids):
+    """Returns the ids of the matches already summarized for the puuid"""
+    rows = conn.execute(f"""SELECT match_id FROM match_summaries
+                        WHERE puuid = ? AND match_id IN ({','.join('?' * len(match_ids))})""",
+                        [puuid, *match_ids]).fetchall()
+    return {row[0] for row in rows}
+
+
+def summarize(match, tracked_puuids):
+    """Returns the summary rows of the tracked summoners of the match
+
+    Parameters:
+        match: dict: match-v5 details of the match
+        tracked_puuids: set: puuids of every tracked summoner
+
+    Returns:
+        list: (puuid, game_start, match_id, queue_id, champion, win, kills,
+        deaths, assists, duration) rows
+    """
+    info = match['info']
+    game_start = info['gameStartTimestamp'] // 1000
+    return [(participant['puuid'], game_start, match['metadata']['matchId'], info['queueId'],
+             participant['championName'], int(participant['win']), participant['kills'], participant['deaths'],
+             participant['assists'], info['gameDuration'])
+            for participant in info['participants'] if participant['puuid'] in tracked_puuids]
+
+
+def store_summaries(conn, rows, cursors, before):
+    """Stores the summaries and the new cursors and deletes the summaries older
+    than the retention
+
+    Parameters:
+        conn: sqlite3.Connection: connection of the Database writer
+        rows: list: summary rows from summarize
+        cursors: list: (puuid, last_match_id) of the puuids whose new matches
+        were all stored
+        before: int: unix time of the oldest kept summary
+
+    Returns:
+        int: amount of the stored summaries
+    """
+    stored = conn.executemany("INSERT OR IGNORE INTO match_summaries VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                              rows).rowcount
+    conn.executemany("""INSERT INTO match_cursors SELECT puuid, match_id, game_start FROM match_summaries
+                     WHERE puuid = ? AND match_id = ?
+                     ON CONFLICT (puuid) DO UPDATE SET last_match_id = excluded.last_match_id,
+                     last_game_start = excluded.last_game_start""", cursors)
+    conn.execute("DELETE FROM match_summaries WHERE game_start < ?", (before,))
+    return stored
+
+
+def recent_matches(conn, region, riot_id, amount):
+    """Returns the latest summaries of the tracked summoner
+
+    Returns:
+        list: (game_start, queue_id, champion, win, kills, deaths, assists,
+        duration) rows, newest first
+    """
+    return conn.execute("""SELECT game_start, queue_id, champion, win, kills, deaths, assists, duration
+                        FROM summoner_identities JOIN match_summaries
+                        ON match_summaries.puuid = summoner_identities.puuid
+                        WHERE summoner_identities.riot_region = ? AND summoner_identities.riot_id = ?
+                        ORDER BY game_start DESC LIMIT ?""", (region, riot_id, amount)).fetchall()
+
+
+def guild_win_rates(conn, guild_id, since):
+    """Returns the wins and games of every summoner of the discord server list
+    played since the given unix time
+
+    Returns:
+        list: (summoner_name, riot_region, wins, games) rows, best first
+    """
+    return conn.execute("""SELECT players.summoner_name, players.riot_region, SUM(win) AS wins, COUNT(*) AS games
+                        FROM guild_players JOIN players ON players.player_id = guild_players.player_id
+                        JOIN summoner_identities ON summoner_identities.riot_region = players.riot_region
+                        AND summoner_identities.riot_id = players.riot_id
+                        JOIN match_summaries ON match_summaries.puuid = summoner_identities.puuid
+                        WHERE guild_players.discord_server = ? AND game_start >= ?
+                        GROUP BY players.player_id
+                        ORDER BY CAST(wins AS REAL) / games DESC, games DESC""", (guild_id, since)).fetchall()
+
+
+async def new_match_ids(riot, routing, puuid, cursor, semaphore):
+    """Returns the ids of the matches played after the last seen one, newest
+    first"""
+    if cursor is None:
+        start_time = time.time() - MATCH_BACKFILL_DAYS * 24 * 3600
+        last_match_id = None
+    else:
+        last_match_id, start_time = cursor
+    async with semaphore:
+        match_ids = await riot.match_ids(routing, puuid, start_time, MATCH_IDS_PAGE)
+    new_ids = []
+    for match_id in match_ids:
+        if match_id == last_match_id:
+            break
+        new_ids.append(match_id)
+    return new_ids
+
+
+async def ingest_matches(db, riot, identities, concurrency=MATCH_CONCURRENCY):
+    """Downloads the new matches of every tracked summoner and stores their
+    summaries. The cursor of a summoner only moves when all of its new matches
+    were stored, so the failed ones are fetched again by the next run
+
+    Parameters:
+        db: Database: asynchronous access to the bot database
+        riot: RiotClient: client of the Riot API
+        identities: IdentityCache: identities of the summoners
+        concurrency: int: maximum amount of the requests sent at once
+
+    Returns:
+        int: amount of the stored summaries
+    """
+    players = await db.fetchall("SELECT riot_id, riot_region FROM players")
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def puuid_of(riot_id, region):
+        async with semaphore:
+            return (await identities.by_id(region, riot_id)).get('puuid')
+
+    players = [(riot_id, regions.BY_PLATFORM[region]) for riot_id, region in players
+               if region in regions.BY_PLATFORM]
+    results = await asyncio.gather(*(puuid_of(riot_id, region.platform) for riot_id, region in players),
+                                   return_exceptions=True)
+    routings = {}
+    for (_, region), puuid in zip(players, results):
+        if isinstance(puuid, Exception):
+            print(puuid)
+        elif puuid is not None:
+            routings[puuid] = region.routing
+
+    cursors = await db.read(read_cursors)
+    puuids = list(routings)
+    results = await asyncio.gather(*(new_match_ids(riot, routings[puuid], puuid, cursors.get(puuid), semaphore)
+                                     for puuid in puuids), return_exceptions=True)
+
+    new_ids = {}
+    wanted = {}
+    for puuid, match_ids in zip(puuids, results):
+        if isinstance(match_ids, Exception):
+            print(match_ids)
+            continue
+        new_ids[puuid] = match_ids
+        if match_ids:
+            stored = await db.read(stored_matches, puuid, match_ids)
+            for match_id in match_ids:
+                if match_id not in stored:
+                    wanted[match_id] = routings[puuid]
+
+    tracked_puuids = set(routings)
+
+    async def download(match_id):
+        async with semaphore:
+            return summarize(await riot.match(wanted[match_id], match_id), tracked_puuids)
+
+    # Five tracked friends of the same match share a single download
+    match_ids = list(wanted)
+    results = await asyncio.gather(*(download(match_id) for match_id in match_ids), return_exceptions=True)
+
+    rows = []
+    failed = set()
+    for match_id, summaries in zip(match_ids, results):
+        if isinstance(summaries, Exception):
+            print(summaries)
+            failed.add(match_id)
+        else:
+            rows.extend(summaries)
+
+    new_cursors = [(puuid, match_ids[0]) for puuid, match_ids in new_ids.items()
+                   if match_ids and not failed.intersection(match_ids)]
+
+    before = int(time.time()) - MATCH_RETENTION_DAYS * 24 * 3600
+    return await db.write(store_summaries, rows, new_cursors, before)
@@ -0,0 +1,188 @@
+"""
+Runtime metrics of the bot. Counters and histograms are kept in the memory
+and updated with a dictionary lookup and an addition, gauges are computed only
+when the metrics are read. Everything is exposed in the Prometheus text format
+on a local HTTP endpoint and summarized by the $stats owner command.
+"""
+import os
+import threading
+from bisect import bisect_left
+
+from aiohttp import web
+
+# Address of the Prometheus endpoint, METRICS_PORT=0 disables it
+METRICS_HOST = os.environ.get('METRICS_HOST', '127.0.0.1')
+METRICS_PORT = int(os.environ.get('METRICS_PORT', '9108'))
+
+# Upper bounds of the histogram buckets in seconds
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+
+def _label_text(label_names, label_values, extra=''):
+    pairs = [f'{name}="{value}"' for name, value in zip(label_names, label_values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+class Counter:
+    """Monotonic counter with the value for every combination of the labels
+
+    Parameters:
+        name: str: metric name
+        description: str: help text of the metric
+        label_names: tuple: names of the labels
+    """
+    kind = 'counter'
+
+    def __init__(self, name, description, label_names=()):
+        self.name = name
+        self.description = description
+        self.label_names = tuple(label_names)
+        self.values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *label_values, amount=1):
+        with self._lock:
+            self.values[label_values] = self.values.get(label_values, 0) + amount
+
+    def total(self):
+        return sum(self.values.values())
+
+    def lines(self):
+        return [f'{self.name}{_label_text(self.label_names, labels)} {value}'
+                for labels, value in sorted(self.values.items())]
+
+
+class Gauge(Counter):
+    """Value which can go up and down, usually set right before the metrics
+    are read"""
+    kind = 'gauge'
+
+    def set(self, value, *label_values):
+        with self._lock:
+            self.values[label_values] = value
+
+
+class Histogram:
+    """Distribution of the observed values with the count and the sum for
+    every combination of the labels
+
+    Parameters:
+        name: str: metric name
+        description: str: help text of the metric
+        label_names: tuple: names of the labels
+        buckets: tuple: sorted upper bounds of the buckets
+    """
+    kind = 'histogram'
+
+    def __init__(self, name, description, label_names=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.description = description
+        self.label_names = tuple(label_names)
+        self.buckets = tuple(buckets)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, *label_values):
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                # Bucket counts followed by the overflow bucket, sum and count
+                series = self._series[label_values] = [0] * (len(self.buckets) + 1) + [0.0, 0]
+            series[bisect_left(self.buckets, value)] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def totals(self):
+        """Returns the labels mapped to the (count, sum) pairs"""
+        with self._lock:
+            return {labels: (series[-1], series[-2]) for labels, series in self._series.items()}
+
+    def quantile(self, quantile, *label_values):
+        """Returns the upper bound of the bucket containing the quantile, None
+        when nothing was observed"""
+        with self._lock:
+            series = self._series.get(label_values)
+            if not series:
+                return None
+            series = list(series)
+        rank = quantile * series[-1]
+        seen = 0
+        for bound, count in zip(self.buckets + (float('inf'),), series):
+            seen += count
+            if seen >= rank:
+                return bound
+        return float('inf')
+
+    def lines(self):
+        with self._lock:
+            items = sorted((labels, list(series)) for labels, series in self._series.items())
+        lines = []
+        for labels, series in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + ('+Inf',), series):
+                cumulative += count
+                bucket_labels = _label_text(self.label_names, labels, f'le="{bound}"')
+                lines.append(f'{self.name}_bucket{bucket_labels} {cumulative}')
+            lines.append(f'{self.name}_sum{_label_text(self.label_names, labels)} {series[-2]}')
+            lines.append(f'{self.name}_count{_label_text(self.label_names, labels)} {series[-1]}')
+        return lines
+
+
+class Registry:
+    """Collection of every metric of the process"""
+    def __init__(self):
+        self.metrics = {}
+
+    def _register(self, metric):
+        if metric.name in self.metrics:
+            raise ValueError(f'Metric {metric.name} is already registered')
+        self.metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name, description, label_names=()):
+        return self._register(Counter(name, description, label_names))
+
+    def gauge(self, name, description, label_names=()):
+        return self._register(Gauge(name, description, label_names))
+
+    def histogram(self, name, description, label_names=(), buckets=LATENCY_BUCKETS):
+        return self._register(Histogram(name, description, label_names, buckets))
+
+    def render(self):
+        """Returns every metric in the Prometheus text format"""
+        lines = []
+        for metric in self.metrics.values():
+            lines.append(f'# HELP {metric.name} {metric.description}')
+            lines.append(f'# TYPE {metric.name} {metric.kind}')
+            lines.extend(metric.lines())
+        return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
+
+
+async def start_server(collect=None, host=METRICS_HOST, port=METRICS_PORT):
+    """Serves the metrics on http://host:port/metrics
+
+    Parameters:
+        collect: callable: coroutine function updating the gauges before
+        every scrape
+        host: str: listening address, local only by default
+        port: int: listening port
+
+    Returns:
+        web.AppRunner: runner which has to be cleaned up to stop the server
+    """
+    async def handle_metrics(request):
+        if collect is not None:
+            await collect()
+        return web.Response(text=registry.render(), content_type='text/plain', charset='utf-8')
+
+    app = web.Application()
+    app.router.add_get('/metrics', handle_metrics)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    return runner
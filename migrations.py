@@ -0,0 +1,202 @@
+"""
+Versioned schema migrations of the bot database. The version of the schema is
+kept in PRAGMA user_version and every migration newer than it is executed in
+its own transaction on the bot startup.
+"""
+
+
+def create_base_schema(conn):
+    """Tables created by the first versions of the bot"""
+    conn.execute("""CREATE TABLE IF NOT EXISTS summoners (
+                summoner_name text,
+                riot_id text,
+                discord_server text,
+                riot_region text
+            )""")
+    conn.execute("""CREATE TABLE IF NOT EXISTS server_config (
+                guild_id text,
+                region text,
+                prefix text
+            )""")
+    conn.execute("""CREATE TABLE IF NOT EXISTS lp_history (
+                riot_id text NOT NULL,
+                queue integer NOT NULL,
+                observed_at integer NOT NULL,
+                resolution integer NOT NULL,
+                tier text NOT NULL,
+                rank text NOT NULL,
+                league_points integer NOT NULL,
+                wins integer NOT NULL,
+                losses integer NOT NULL,
+                PRIMARY KEY (riot_id, queue, observed_at, resolution)
+            ) WITHOUT ROWID""")
+
+
+def add_server_config_key(conn):
+    """Rebuilds server_config with guild_id as the primary key, keeping the
+    first row of every discord server"""
+    conn.execute("""CREATE TABLE server_config_new (
+                guild_id text PRIMARY KEY,
+                region text NOT NULL,
+                prefix text NOT NULL
+            )""")
+    conn.execute("""INSERT OR IGNORE INTO server_config_new
+                 SELECT guild_id, region, prefix FROM server_config
+                 WHERE guild_id IS NOT NULL ORDER BY rowid""")
+    conn.execute("DROP TABLE server_config")
+    conn.execute("ALTER TABLE server_config_new RENAME TO server_config")
+
+
+def normalize_roster(conn):
+    """Splits summoners into the global players table and the guild_players
+    membership table. summoners stays available as a read only view with the
+    same columns"""
+    conn.execute("""CREATE TABLE players (
+                player_id integer PRIMARY KEY,
+                riot_id text NOT NULL,
+                riot_region text NOT NULL,
+                summoner_name text NOT NULL,
+                UNIQUE (riot_id, riot_region)
+            )""")
+    conn.execute("CREATE INDEX players_name ON players (riot_region, summoner_name COLLATE NOCASE)")
+    conn.execute("""CREATE TABLE guild_players (
+                discord_server text NOT NULL,
+                player_id integer NOT NULL REFERENCES players (player_id),
+                PRIMARY KEY (discord_server, player_id)
+            ) WITHOUT ROWID""")
+    conn.execute("CREATE INDEX guild_players_player ON guild_players (player_id)")
+    conn.execute("""INSERT OR IGNORE INTO players (riot_id, riot_region, summoner_name)
+                 SELECT riot_id, riot_region, summoner_name FROM summoners
+                 WHERE riot_id IS NOT NULL AND riot_region IS NOT NULL ORDER BY rowid""")
+    conn.execute("""INSERT OR IGNORE INTO guild_players
+                 SELECT summoners.discord_server, players.player_id FROM summoners
+                 JOIN players ON players.riot_id = summoners.riot_id
+                 AND players.riot_region = summoners.riot_region
+                 WHERE summoners.discord_server IS NOT NULL""")
+    conn.execute("DROP TABLE summoners")
+    conn.execute("""CREATE VIEW summoners AS
+                 SELECT players.summoner_name, players.riot_id, guild_players.discord_server, players.riot_region
+                 FROM guild_players JOIN players ON players.player_id = guild_players.player_id""")
+
+
+def add_league_entries(conn):
+    """Latest ranked entry of every tracked summoner shared by all discord
+    servers, indexed for the regional top-K queries. ladder_versions changes
+    every time the ladder of the region and queue changes"""
+    conn.execute("""CREATE TABLE league_entries (
+                riot_region text NOT NULL,
+                queue integer NOT NULL,
+                riot_id text NOT NULL,
+                tier text NOT NULL,
+                rank text NOT NULL,
+                league_points integer NOT NULL,
+                wins integer NOT NULL,
+                losses integer NOT NULL,
+                score integer NOT NULL,
+                PRIMARY KEY (riot_region, queue, riot_id)
+            ) WITHOUT ROWID""")
+    conn.execute("CREATE INDEX league_entries_score ON league_entries (riot_region, queue, score DESC, riot_id)")
+    conn.execute("""CREATE TABLE ladder_versions (
+                riot_region text NOT NULL,
+                queue integer NOT NULL,
+                version integer NOT NULL,
+                PRIMARY KEY (riot_region, queue)
+            ) WITHOUT ROWID""")
+
+
+def add_shard_stats(conn):
+    """Latest counters published by every shard of the bot, so the owner
+    commands of any process can show the totals of all of them"""
+    conn.execute("""CREATE TABLE shard_stats (
+                shard_id integer PRIMARY KEY,
+                shard_count integer NOT NULL,
+                guilds integer NOT NULL,
+                latency real NOT NULL,
+                pid integer NOT NULL,
+                updated_at integer NOT NULL
+            )""")
+
+
+def add_summoner_identities(conn):
+    """Identities of the summoners confirmed by the Riot API, shared by every
+    discord server and looked up by the name or by the encrypted id"""
+    conn.execute("""CREATE TABLE summoner_identities (
+                riot_region text NOT NULL,
+                riot_id text NOT NULL,
+                normalized_name text NOT NULL,
+                puuid text,
+                summoner_name text NOT NULL,
+                verified_at integer NOT NULL,
+                PRIMARY KEY (riot_region, riot_id)
+            ) WITHOUT ROWID""")
+    conn.execute("CREATE UNIQUE INDEX summoner_identities_name ON summoner_identities (riot_region, normalized_name)")
+
+
+def add_match_history(conn):
+    """Compact summaries of the matches of the tracked summoners and the last
+    match seen for every puuid, so only the newer matches are downloaded"""
+    conn.execute("""CREATE TABLE match_summaries (
+                puuid text NOT NULL,
+                game_start integer NOT NULL,
+                match_id text NOT NULL,
+                queue_id integer NOT NULL,
+                champion text NOT NULL,
+                win integer NOT NULL,
+                kills integer NOT NULL,
+                deaths integer NOT NULL,
+                assists integer NOT NULL,
+                duration integer NOT NULL,
+                PRIMARY KEY (puuid, match_id)
+            ) WITHOUT ROWID""")
+    conn.execute("CREATE INDEX match_summaries_start ON match_summaries (puuid, game_start)")
+    conn.execute("""CREATE TABLE match_cursors (
+                puuid text PRIMARY KEY,
+                last_match_id text NOT NULL,
+                last_game_start integer NOT NULL
+            ) WITHOUT ROWID""")
+
+
+MIGRATIONS = [
+    (1, create_base_schema),
+    (2, add_server_config_key),
+    (3, normalize_roster),
+    (4, add_league_entries),
+    (5, add_shard_stats),
+    (6, add_summoner_identities),
+    (7, add_match_history),
+]
+
+
+def run_migrations(conn):
+    """Switches the database into WAL mode and executes every migration newer
+    than the current schema version. The version is checked again inside of
+    the write transaction, so processes starting at the same time don't run
+    the same migration twice
+
+    Parameters:
+        conn: sqlite3.Connection: connection to the bot database
+
+    Returns:
+        int: schema version after the migrations
+    """
+    conn.execute("PRAGMA journal_mode = WAL")
+    version = conn.execute("PRAGMA user_version").fetchone()[0]
+
+    for migration_version, migration in MIGRATIONS:
+        if migration_version <= version:
+            continue
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            if conn.execute("PRAGMA user_version").fetchone()[0] >= migration_version:
+                conn.commit()
+                continue
+            migration(conn)
+            conn.execute(f"PRAGMA user_version = {migration_version}")
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        print(f"Database migrated to version {migration_version}")
+        version = migration_version
+
+    return version
@@ -0,0 +1,408 @@
+"""
+Local stand-in for the Riot API used for the load tests. It serves the
+summoner-v4, league-v4 and match-v5 endpoints called by the bot from a
+synthetic player population and its matches, adds the latency of the real
+servers, answers with the rate limit headers and returns 429 when the limits
+are exceeded or when it's told to inject them. Point the bot at it with the
+RIOT_API_HOST environment variable, match-v5 is served under the regional
+routing values ex. /europe:
+
+    python mock_riot.py --players 5000 --latency lognormal:60:0.4
+    RIOT_API_HOST=http://127.0.0.1:8080/{region} python main.py
+"""
+import argparse
+import asyncio
+import random
+import string
+import time
+
+from aiohttp import web
+
+import regions
+import roster
+from database import Database
+from migrations import run_migrations
+from rate_limit import RateLimiter, parse_limits
+
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 8080
+DEFAULT_REGIONS = ('eun1', 'euw1')
+
+# Limits of the development key, the method limits are shared by the endpoint
+# families the same way as on the real servers
+MOCK_APP_LIMITS = '20:1,100:120'
+MOCK_METHOD_LIMITS = {'summoner-v4': '2000:60', 'league-v4': '300:60', 'match-v5-ids': '2000:10',
+                      'match-v5': '2000:10'}
+
+# Share of the synthetic summoners with the entries of the ranked queues
+SOLO_RANKED_SHARE = 0.8
+FLEX_RANKED_SHARE = 0.4
+
+TIERS = ['IRON', 'BRONZE', 'SILVER', 'GOLD', 'PLATINUM', 'EMERALD', 'DIAMOND',
+         'MASTER', 'GRANDMASTER', 'CHALLENGER']
+# Roughly the distribution of the real ladder, from iron to challenger
+TIER_WEIGHTS = [8, 20, 22, 20, 14, 9, 5, 1.2, 0.5, 0.3]
+DIVISIONS = ['IV', 'III', 'II', 'I']
+APEX_TIERS = ('MASTER', 'GRANDMASTER', 'CHALLENGER')
+
+# Matches played by every synthetic summoner, spread over the last days
+MATCHES_PER_SUMMONER = 20
+MATCH_DAYS = 14
+MATCH_QUEUES = [420, 420, 440, 400, 450]
+CHAMPIONS = ['Kayn', 'Rhaast', 'Shyvana', 'Zed', 'Lux', 'Orianna', 'Annie', 'Thresh', 'Vi', 'Jinx', 'Xayah',
+              'Talon', 'Morgana', 'Nami', 'Ashe']
+
+NAME_SYLLABLES = ['ka', 'yn', 'rha', 'ast', 'shy', 'va', 'zed', 'lux', 'ori', 'ann', 'mor', 'ga', 'na',
+                  'tal', 'ion', 'thr', 'esh', 'vi', 'jin', 'xa']
+
+
+def normalize_name(summoner_name):
+    """Returns the summoner name the way Riot compares them, without the
+    spaces and the letter case"""
+    return summoner_name.replace(' ', '').lower()
+
+
+def _encrypted_id(rng, length):
+    return ''.join(rng.choice(string.ascii_letters + string.digits + '-_') for _ in range(length))
+
+
+def _league_entry(rng, summoner, queue_type):
+    tier = rng.choices(TIERS, weights=TIER_WEIGHTS)[0]
+    if tier in APEX_TIERS:
+        rank = 'I'
+        league_points = rng.randint(0, 1500)
+    else:
+        rank = rng.choice(DIVISIONS)
+        league_points = rng.randint(0, 99)
+    wins = rng.randint(0, 400)
+    losses = max(0, wins + rng.randint(-40, 40))
+    return {
+        'leagueId': _encrypted_id(rng, 36),
+        'queueType': queue_type,
+        'tier': tier,
+        'rank': rank,
+        'summonerId': summoner['id'],
+        'summonerName': summoner['name'],
+        'leaguePoints': league_points,
+        'wins': wins,
+        'losses': losses,
+        'veteran': wins + losses > 300,
+        'inactive': False,
+        'freshBlood': wins + losses < 20,
+        'hotStreak': rng.random() < 0.1,
+    }
+
+
+def synthetic_population(players, regions=DEFAULT_REGIONS, seed=0):
+    """Generates the summoners of every region together with their ranked
+    entries. The same seed always gives the same population
+
+    Parameters:
+        players: int: amount of the summoners in every region
+        regions: iterable: platform ids of the regions
+        seed: int: seed of the random generator
+
+    Returns:
+        dict: platform id mapped to the list of (summoner, league entries)
+    """
+    rng = random.Random(seed)
+    population = {}
+    for region in regions:
+        summoners = []
+        for number in range(players):
+            name = ''.join(rng.choice(NAME_SYLLABLES) for _ in range(rng.randint(2, 3))).capitalize()
+            summoner = {
+                'id': _encrypted_id(rng, 47),
+                'accountId': _encrypted_id(rng, 47),
+                'puuid': _encrypted_id(rng, 78),
+                'name': f'{name} {number}',
+                'profileIconId': rng.randint(0, 5000),
+                'revisionDate': int(time.time() * 1000) - rng.randint(0, 30 * 86400 * 1000),
+                'summonerLevel': rng.randint(30, 500),
+            }
+            entries = []
+            if rng.random() < SOLO_RANKED_SHARE:
+                entries.append(_league_entry(rng, summoner, 'RANKED_SOLO_5x5'))
+            if rng.random() < FLEX_RANKED_SHARE:
+                entries.append(_league_entry(rng, summoner, 'RANKED_FLEX_SR'))
+            summoners.append((summoner, entries))
+        population[region] = summoners
+    return population
+
+
+def synthetic_matches(population, matches_per_summoner=MATCHES_PER_SUMMONER, seed=0):
+    """Generates the matches of ten random summoners of the same region, so
+    many summoners share the same match the way the tracked friends do
+
+    Parameters:
+        population: dict: result of synthetic_population
+        matches_per_summoner: int: average amount of the matches of a summoner
+        seed: int: seed of the random generator
+
+    Returns:
+        tuple: match id mapped to the match-v5 details and the puuid mapped
+        to the ids of its matches, newest first
+    """
+    rng = random.Random(seed)
+    now = int(time.time())
+    matches = {}
+    match_ids = {}
+    for region, summoners in population.items():
+        for number in range(len(summoners) * matches_per_summoner // 10):
+            match_id = f'{region.upper()}_{number + 1}'
+            players = rng.sample(summoners, min(10, len(summoners)))
+            duration = rng.randint(900, 2400)
+            participants = [{
+                'puuid': summoner['puuid'],
+                'summonerId': summoner['id'],
+                'summonerName': summoner['name'],
+                'championName': rng.choice(CHAMPIONS),
+                'teamId': 100 if index < 5 else 200,
+                'win': index < 5,
+                'kills': rng.randint(0, 20),
+                'deaths': rng.randint(0, 15),
+                'assists': rng.randint(0, 25),
+            } for index, (summoner, _) in enumerate(players)]
+            matches[match_id] = {
+                'metadata': {'matchId': match_id, 'participants': [player['puuid'] for player in participants]},
+                'info': {
+                    'gameStartTimestamp': (now - rng.randint(duration, MATCH_DAYS * 86400)) * 1000,
+                    'gameDuration': duration,
+                    'queueId': rng.choice(MATCH_QUEUES),
+                    'participants': participants,
+                },
+            }
+            for player in participants:
+                match_ids.setdefault(player['puuid'], []).append(match_id)
+    for ids in match_ids.values():
+        ids.sort(key=lambda match_id: matches[match_id]['info']['gameStartTimestamp'], reverse=True)
+    return matches, match_ids
+
+
+def latency_sampler(spec, rng=None):
+    """Returns the function giving the latency of a single response in seconds
+
+    Parameters:
+        spec: str: distribution and its parameters in milliseconds, one of
+        const:MS, uniform:LOW:HIGH, normal:MEAN:STDDEV, lognormal:MEDIAN:SIGMA
+
+    Returns:
+        callable: function without arguments returning the latency
+    """
+    rng = rng or random.Random()
+    kind, *params = spec.split(':')
+    params = [float(param) for param in params]
+
+    if kind == 'const':
+        return lambda: params[0] / 1000
+    if kind == 'uniform':
+        return lambda: rng.uniform(params[0], params[1]) / 1000
+    if kind == 'normal':
+        return lambda: max(0.0, rng.gauss(params[0], params[1])) / 1000
+    if kind == 'lognormal':
+        # The median of lognormvariate(mu, sigma) is e^mu, so it's scaled by it
+        return lambda: params[0] * rng.lognormvariate(0, params[1]) / 1000
+    raise ValueError(f'Unknown latency distribution {kind}')
+
+
+class MockRiotApi:
+    """Class responsible for answering the Riot API requests from the
+    synthetic population
+
+    Parameters:
+        population: dict: result of synthetic_population
+        latency: str: latency distribution, see latency_sampler
+        app_limits: str: application rate limits in the Riot header format
+        method_limits: dict: endpoint family mapped to its rate limits
+        inject_429: float: probability of the 429 answer to any request
+        seed: int: seed of the latency and the injected 429 answers
+        matches_per_summoner: int: average amount of the synthetic matches
+        of a summoner
+    """
+    def __init__(self, population, latency='const:0', app_limits=MOCK_APP_LIMITS,
+                 method_limits=None, inject_429=0.0, seed=0, matches_per_summoner=MATCHES_PER_SUMMONER):
+        self._rng = random.Random(seed)
+        self._latency = latency_sampler(latency, self._rng)
+        self.app_limits = app_limits
+        self.method_limits = dict(MOCK_METHOD_LIMITS if method_limits is None else method_limits)
+        self.inject_429 = inject_429
+
+        self._by_id = {}
+        self._by_name = {}
+        self._league_entries = {}
+        for region, summoners in population.items():
+            for summoner, entries in summoners:
+                self._by_id[(region, summoner['id'])] = summoner
+                self._by_name[(region, normalize_name(summoner['name']))] = summoner
+                self._league_entries[(region, summoner['id'])] = entries
+        self._matches, self._match_ids = synthetic_matches(population, matches_per_summoner, seed)
+        # Matches are only served by the routing value of their region
+        self._routings = {region: regions.by_platform(region).routing for region in population}
+
+        self._app = {}
+        self._method = {}
+        self.stats = {'requests': 0, 'rate_limited': 0, 'injected': 0, 'not_found': 0}
+
+    def _limiters(self, region, family):
+        app = self._app.get(region)
+        if app is None:
+            app = self._app[region] = RateLimiter(parse_limits(self.app_limits))
+        method = self._method.get((region, family))
+        if method is None:
+            method = self._method[(region, family)] = RateLimiter(parse_limits(self.method_limits[family]))
+        return app, method
+
+    @staticmethod
+    def _counts(limiter):
+        return ','.join(f'{len(window.sent)}:{seconds}' for seconds, window in limiter.windows.items())
+
+    async def _answer(self, request, family, data):
+        """Applies the latency and the rate limits to the answer
+
+        Parameters:
+            request: web.Request: handled request
+            family: str: endpoint family of the request
+            data: dict or list or None: answer, None for 404
+        """
+        self.stats['requests'] += 1
+        await asyncio.sleep(self._latency())
+
+        app, method = self._limiters(request.match_info['region'], family)
+        now = time.monotonic()
+        app_delay = app.delay(now)
+        method_delay = method.delay(now)
+        if app_delay <= 0 and method_delay <= 0:
+            app.record(now)
+            method.record(now)
+
+        headers = {
+            'X-App-Rate-Limit': self.app_limits,
+            'X-App-Rate-Limit-Count': self._counts(app),
+            'X-Method-Rate-Limit': self.method_limits[family],
+            'X-Method-Rate-Limit-Count': self._counts(method),
+        }
+
+        if app_delay > 0 or method_delay > 0:
+            self.stats['rate_limited'] += 1
+            headers['X-Rate-Limit-Type'] = 'application' if app_delay >= method_delay else 'method'
+            headers['Retry-After'] = str(max(1, round(max(app_delay, method_delay))))
+            return web.json_response({'status': {'message': 'Rate limit exceeded', 'status_code': 429}},
+                                     status=429, headers=headers)
+        if self.inject_429 and self._rng.random() < self.inject_429:
+            # 429 of the underlying service comes without Retry-After
+            self.stats['injected'] += 1
+            headers['X-Rate-Limit-Type'] = 'service'
+            return web.json_response({'status': {'message': 'Rate limit exceeded', 'status_code': 429}},
+                                     status=429, headers=headers)
+        if data is None:
+            self.stats['not_found'] += 1
+            return web.json_response({'status': {'message': 'Data not found', 'status_code': 404}},
+                                     status=404, headers=headers)
+        return web.json_response(data, headers=headers)
+
+    async def summoner_by_name(self, request):
+        key = (request.match_info['region'], normalize_name(request.match_info['name']))
+        return await self._answer(request, 'summoner-v4', self._by_name.get(key))
+
+    async def summoner_by_id(self, request):
+        key = (request.match_info['region'], request.match_info['summoner_id'])
+        return await self._answer(request, 'summoner-v4', self._by_id.get(key))
+
+    async def league_entries(self, request):
+        key = (request.match_info['region'], request.match_info['summoner_id'])
+        return await self._answer(request, 'league-v4', self._league_entries.get(key))
+
+    async def match_ids(self, request):
+        ids = self._match_ids.get(request.match_info['puuid'], [])
+        query = request.query
+        try:
+            start_time = int(query.get('startTime', 0)) * 1000
+            start = int(query.get('start', 0))
+            count = int(query.get('count', 20))
+        except ValueError:
+            return web.json_response({'status': {'message': 'Bad request', 'status_code': 400}}, status=400)
+        ids = [match_id for match_id in ids
+               if self._matches[match_id]['info']['gameStartTimestamp'] >= start_time
+               and self._routings[match_id.split('_')[0].lower()] == request.match_info['region']]
+        return await self._answer(request, 'match-v5-ids', ids[start:start + count])
+
+    async def match(self, request):
+        match_id = request.match_info['match_id']
+        match = self._matches.get(match_id)
+        if match is not None and self._routings[match_id.split('_')[0].lower()] != request.match_info['region']:
+            match = None
+        return await self._answer(request, 'match-v5', match)
+
+    async def mock_stats(self, request):
+        """Counters of the answered requests, not limited and not delayed"""
+        return web.json_response(self.stats)
+
+    def application(self):
+        """Returns the aiohttp application serving the endpoints. Every path
+        starts with the platform id, so the bot uses the RIOT_API_HOST of
+        http://host:port/{region}"""
+        app = web.Application()
+        app.router.add_get('/mock/stats', self.mock_stats)
+        app.router.add_get('/{region}/lol/summoner/v4/summoners/by-name/{name}', self.summoner_by_name)
+        app.router.add_get('/{region}/lol/summoner/v4/summoners/{summoner_id}', self.summoner_by_id)
+        app.router.add_get('/{region}/lol/league/v4/entries/by-summoner/{summoner_id}', self.league_entries)
+        app.router.add_get('/{region}/lol/match/v5/matches/by-puuid/{puuid}/ids', self.match_ids)
+        app.router.add_get('/{region}/lol/match/v5/matches/{match_id}', self.match)
+        return app
+
+
+async def start_server(mock, host=DEFAULT_HOST, port=DEFAULT_PORT):
+    """Starts serving the mock on the running event loop
+
+    Returns:
+        web.AppRunner: runner which has to be cleaned up to stop the server
+    """
+    runner = web.AppRunner(mock.application())
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    return runner
+
+
+def seed_roster(conn, population, guild_id, players):
+    """Adds the first players of every region of the population to the ranking
+    list of the discord server, so the bot commands have something to work on"""
+    for region, summoners in population.items():
+        for summoner, _ in summoners[:players]:
+            roster.add_player(conn, guild_id, summoner['name'], summoner['id'], region)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Local stand-in for the Riot API')
+    parser.add_argument('--host', default=DEFAULT_HOST)
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    parser.add_argument('--players', type=int, default=1000, help='summoners in every region')
+    parser.add_argument('--regions', default=','.join(DEFAULT_REGIONS), help='comma separated platform ids')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--latency', default='lognormal:60:0.4',
+                        help='const:MS, uniform:LOW:HIGH, normal:MEAN:STDDEV or lognormal:MEDIAN:SIGMA')
+    parser.add_argument('--app-limits', default=MOCK_APP_LIMITS)
+    parser.add_argument('--inject-429', type=float, default=0.0, help='probability of the injected 429')
+    parser.add_argument('--matches', type=int, default=MATCHES_PER_SUMMONER, help='matches of every summoner')
+    parser.add_argument('--roster-db', help='database of the bot to add the synthetic players to')
+    parser.add_argument('--guild', help='discord server id which gets the synthetic players')
+    parser.add_argument('--roster-size', type=int, default=100, help='players added from every region')
+    args = parser.parse_args()
+
+    population = synthetic_population(args.players, args.regions.split(','), args.seed)
+
+    if args.roster_db:
+        if not args.guild:
+            parser.error('--roster-db needs --guild')
+        db = Database(args.roster_db)
+        db.run_sync(run_migrations)
+        db.run_sync(seed_roster, population, args.guild, args.roster_size)
+        print(f'Added {args.roster_size} players of every region to the discord server {args.guild}')
+
+    mock = MockRiotApi(population, latency=args.latency, app_limits=args.app_limits,
+                       inject_429=args.inject_429, seed=args.seed, matches_per_summoner=args.matches)
+    print(f'Serving {args.players} summoners of {args.regions} with {args.latency} latency')
+    web.run_app(mock.application(), host=args.host, port=args.port)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,310 @@
+"""
+Rate limit governor for the Riot API. Riot enforces an application limit for
+every region and a method limit for every endpoint of that region. Limits are
+learned from the X-App-Rate-Limit and X-Method-Rate-Limit response headers and
+every request is delayed until it fits into all of the windows.
+
+Waiting requests are served by priority. Requests made for the users go
+first, the background work only uses the capacity they leave and a background
+request which waits too long is served before the others, so it never starves.
+"""
+import asyncio
+import time
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from metrics import registry
+
+# Limits of the development key, used until the first response tells us more
+DEFAULT_APP_LIMITS = ((20, 1), (100, 120))
+
+# Back off used when Riot answers 429 without the Retry-After header
+DEFAULT_RETRY_AFTER = 1
+
+# Seconds every window of the governor is kept longer than the window of Riot.
+# Riot counts the request when it arrives, so a request sent right when the
+# oldest one leaves the window can reach Riot before that one left it there
+SAFETY_MARGIN = 0.1
+
+INTERACTIVE = 0
+BACKGROUND = 1
+PRIORITY_NAMES = ('interactive', 'background')
+
+# Share of every window the background requests leave for the interactive ones
+BACKGROUND_RESERVE = 0.25
+
+# Seconds after which the waiting background request goes before the others
+STARVATION_LIMIT = 10
+
+# Priority of the requests made by the current task, see background_requests
+request_priority = ContextVar('request_priority', default=INTERACTIVE)
+
+QUEUE_DEPTH = registry.gauge('kayn_riot_queue_depth', 'Requests waiting for the rate limits',
+                             ('region', 'endpoint', 'priority'))
+
+
+@contextmanager
+def background_requests():
+    """Marks the Riot API requests made inside of the block, including the
+    tasks started from it, as the background work"""
+    token = request_priority.set(BACKGROUND)
+    try:
+        yield
+    finally:
+        request_priority.reset(token)
+
+
+def parse_limits(header_value):
+    """Returns the list of (limit, seconds) pairs from the rate limit header
+
+    Parameters:
+        header_value: str: header value in the Riot format ex. '20:1,100:120'
+
+    Returns:
+        list: (limit, seconds) tuples of every window
+    """
+    windows = []
+    for pair in header_value.split(','):
+        limit, seconds = pair.strip().split(':')
+        windows.append((int(limit), int(seconds)))
+    return windows
+
+
+class RateLimitWindow:
+    """Sliding window remembering the moments of the requests sent inside of
+    it
+
+    Parameters:
+        limit: int: amount of requests allowed inside of the window
+        seconds: int: length of the window
+        margin: float: seconds the requests are remembered after they left
+        the window
+    """
+    def __init__(self, limit, seconds, margin=0.0):
+        self.limit = limit
+        self.seconds = seconds
+        self.margin = margin
+        self.sent = deque()
+
+    def _prune(self, now):
+        while self.sent and self.sent[0] <= now - self.seconds - self.margin:
+            self.sent.popleft()
+
+    def delay(self, now, reserve=0.0):
+        """Returns how many seconds have to pass before the next request fits,
+        leaving the reserved share of the window unused"""
+        limit = max(1, self.limit - int(self.limit * reserve))
+        self._prune(now)
+        if len(self.sent) < limit:
+            return 0
+        return self.sent[-limit] + self.seconds + self.margin - now
+
+    def record(self, now):
+        self.sent.append(now)
+
+    def sync(self, count, now):
+        """Pads the window with the requests Riot counted but we did not send,
+        for example when other process shares the same key"""
+        self._prune(now)
+        for _ in range(count - len(self.sent)):
+            self.sent.append(now)
+
+
+class RateLimiter:
+    """Set of windows which all have to allow the request
+
+    Parameters:
+        windows: iterable: (limit, seconds) pairs
+        margin: float: seconds every window is kept longer, see SAFETY_MARGIN
+        share: float: part of every limit this process may use, when many
+        processes share the same key
+    """
+    def __init__(self, windows=(), margin=0.0, share=1.0):
+        self.margin = margin
+        self.share = share
+        self.windows = {seconds: RateLimitWindow(self._own(limit), seconds, margin) for limit, seconds in windows}
+        self.blocked_until = 0
+
+    def _own(self, limit):
+        return max(1, int(limit * self.share))
+
+    def delay(self, now, reserve=0.0):
+        """Returns how many seconds have to pass before the next request fits"""
+        delays = [window.delay(now, reserve) for window in self.windows.values()]
+        delays.append(self.blocked_until - now)
+        return max(delays)
+
+    def record(self, now):
+        for window in self.windows.values():
+            window.record(now)
+
+    def update(self, limits_header, counts_header=None):
+        """Learns the windows from the response headers, keeping the requests
+        already recorded in the windows which did not change"""
+        now = time.monotonic()
+        windows = {}
+        for limit, seconds in parse_limits(limits_header):
+            window = self.windows.get(seconds) or RateLimitWindow(self._own(limit), seconds, self.margin)
+            window.limit = self._own(limit)
+            windows[seconds] = window
+        self.windows = windows
+
+        if counts_header:
+            # Riot counts the requests of every process, this process is
+            # charged with its share of them
+            for count, seconds in parse_limits(counts_header):
+                if seconds in self.windows:
+                    self.windows[seconds].sync(int(count * self.share), now)
+
+    def block(self, seconds):
+        """Stops every request for the given amount of seconds"""
+        self.blocked_until = max(self.blocked_until, time.monotonic() + seconds)
+
+
+class RequestQueue:
+    """Requests of a single region and endpoint family waiting for the rate
+    limits, one queue per priority"""
+    def __init__(self, region, family):
+        self.region = region
+        self.family = family
+        self.waiting = tuple(deque() for _ in PRIORITY_NAMES)
+        self.arrived = asyncio.Event()
+        self.pump = None
+
+    def __bool__(self):
+        return any(self.waiting)
+
+    def push(self, priority, future):
+        self.waiting[priority].append((time.monotonic(), future))
+        self.arrived.set()
+        self._update_depth(priority)
+
+    def next(self, now):
+        """Returns the priority of the request which goes next and whether the
+        whole window is available to it"""
+        background = self.waiting[BACKGROUND]
+        if background and now - background[0][0] > STARVATION_LIMIT:
+            return BACKGROUND, True
+        for priority, waiting in enumerate(self.waiting):
+            if waiting:
+                return priority, priority == INTERACTIVE
+        return None, False
+
+    def pop(self, priority):
+        _, future = self.waiting[priority].popleft()
+        self._update_depth(priority)
+        return future
+
+    def _update_depth(self, priority):
+        QUEUE_DEPTH.set(len(self.waiting[priority]), self.region, self.family, PRIORITY_NAMES[priority])
+
+
+class RateLimitGovernor:
+    """Class responsible for scheduling the Riot API requests. It keeps one
+    application limiter per region and one method limiter per region and
+    endpoint family (summoner-v4, league-v4, ...). Every region and family
+    has its queue of the waiting requests served by priority.
+
+    Parameters:
+        app_limits: iterable: (limit, seconds) pairs used before the first
+        response of the region is seen
+        margin: float: seconds every window is kept longer than the one of
+        Riot
+        processes: int: amount of the bot processes using the same key, each
+        of them gets the same part of every limit
+    """
+    def __init__(self, app_limits=DEFAULT_APP_LIMITS, margin=SAFETY_MARGIN, processes=1):
+        self._app_limits = app_limits
+        self._margin = margin
+        self._share = 1 / processes
+        self._app = {}
+        self._method = {}
+        self._queues = {}
+        self.throttled = 0
+
+    def _limiters(self, region, family):
+        app = self._app.get(region)
+        if app is None:
+            app = self._app[region] = RateLimiter(self._app_limits, self._margin, self._share)
+        method = self._method.get((region, family))
+        if method is None:
+            method = self._method[(region, family)] = RateLimiter(margin=self._margin, share=self._share)
+        return app, method
+
+    async def acquire(self, region, family, priority=None):
+        """Waits until the request fits into every window of the region and
+        the endpoint family, then reserves the slot for it
+
+        Parameters:
+            region: str: platform id of the region ex. eun1
+            family: str: endpoint family ex. league-v4
+            priority: int: INTERACTIVE or BACKGROUND, the priority of the
+            current task when not given
+        """
+        if priority is None:
+            priority = request_priority.get()
+        queue = self._queues.get((region, family))
+        if queue is None:
+            queue = self._queues[(region, family)] = RequestQueue(region, family)
+
+        future = asyncio.get_event_loop().create_future()
+        queue.push(priority, future)
+        if queue.pump is None or queue.pump.done():
+            queue.pump = asyncio.ensure_future(self._pump(queue))
+        await future
+
+    async def _pump(self, queue):
+        """Hands out the free slots of the windows to the waiting requests
+        until the queue is empty. Sleeping for the window is interrupted by
+        every new request, which might have a higher priority"""
+        app, method = self._limiters(queue.region, queue.family)
+        while queue:
+            now = time.monotonic()
+            priority, full_window = queue.next(now)
+            if queue.waiting[priority][0][1].done():
+                # The waiting request was cancelled
+                queue.pop(priority)
+                continue
+
+            reserve = 0.0 if full_window else BACKGROUND_RESERVE
+            wait = max(app.delay(now, reserve), method.delay(now, reserve))
+            if wait <= 0:
+                app.record(now)
+                method.record(now)
+                queue.pop(priority).set_result(None)
+                continue
+
+            queue.arrived.clear()
+            try:
+                await asyncio.wait_for(queue.arrived.wait(), wait)
+            except asyncio.TimeoutError:
+                pass
+
+    def update(self, region, family, headers):
+        """Learns the current limits from the Riot API response headers"""
+        app, method = self._limiters(region, family)
+        if 'X-App-Rate-Limit' in headers:
+            app.update(headers['X-App-Rate-Limit'], headers.get('X-App-Rate-Limit-Count'))
+        if 'X-Method-Rate-Limit' in headers:
+            method.update(headers['X-Method-Rate-Limit'], headers.get('X-Method-Rate-Limit-Count'))
+
+    def back_off(self, region, family, headers):
+        """Blocks the limiter responsible for 429 response for the time given
+        in Retry-After header
+
+        Returns:
+            float: seconds the limiter is blocked for
+        """
+        self.throttled += 1
+        app, method = self._limiters(region, family)
+        try:
+            retry_after = float(headers.get('Retry-After', DEFAULT_RETRY_AFTER))
+        except ValueError:
+            retry_after = DEFAULT_RETRY_AFTER
+
+        if headers.get('X-Rate-Limit-Type') == 'application':
+            app.block(retry_after)
+        else:
+            method.block(retry_after)
+        return retry_after
@@ -0,0 +1,100 @@
+"""
+Background reconciliation of the tracked summoners. Summoners can change
+their names, and their encrypted ids change together with the API key, so
+every player is periodically checked against its identity, which goes to the
+Riot API only when it wasn't confirmed recently, and all the changes are
+written in a single transaction.
+"""
+import asyncio
+
+from leaderboard import bump_ladder_versions
+from riot_api import RiotApiError
+
+RECONCILE_CONCURRENCY = 4
+
+
+async def check_player(identities, player, semaphore):
+    """Returns the current identity of the stored player. When the stored
+    encrypted id is no longer valid the summoner is found by name
+
+    Parameters:
+        identities: IdentityCache: identities of the summoners
+        player: tuple: (player_id, riot_id, riot_region, summoner_name) row
+        semaphore: asyncio.Semaphore: concurrency bound of the sweep
+
+    Returns:
+        dict: id, puuid and name of the summoner
+    """
+    _, riot_id, region, summoner_name = player
+    async with semaphore:
+        try:
+            return await identities.by_id(region, riot_id)
+        except RiotApiError as err:
+            if err.status not in (400, 404):
+                raise
+            return await identities.by_name(region, summoner_name)
+
+
+def move_riot_id(conn, region, old_id, new_id):
+    """Moves the league entries and the LP history of the summoner to its new
+    encrypted id. Rows the new id already has are kept and the old ones
+    dropped"""
+    conn.execute("UPDATE OR IGNORE league_entries SET riot_id = ? WHERE riot_region = ? AND riot_id = ?",
+                 (new_id, region, old_id))
+    conn.execute("DELETE FROM league_entries WHERE riot_region = ? AND riot_id = ?", (region, old_id))
+    conn.execute("UPDATE OR IGNORE lp_history SET riot_id = ? WHERE riot_id = ?", (new_id, old_id))
+    conn.execute("DELETE FROM lp_history WHERE riot_id = ?", (old_id,))
+
+
+def apply_changes(conn, changes):
+    """Writes the changed names and ids, skipping the changes which would
+    duplicate already stored player. The rows keyed by the encrypted id
+    follow the changed id
+
+    Returns:
+        list: the applied changes
+    """
+    applied = []
+    for change in changes:
+        _, riot_id, player_id = change
+        stored = conn.execute("SELECT riot_id, riot_region FROM players WHERE player_id = ?", (player_id,)).fetchone()
+        if stored is None or not conn.execute("UPDATE OR IGNORE players SET summoner_name = ?, riot_id = ? "
+                                              "WHERE player_id = ?", change).rowcount:
+            continue
+        applied.append(change)
+        if stored[0] != riot_id:
+            move_riot_id(conn, stored[1], stored[0], riot_id)
+    if applied:
+        bump_ladder_versions(conn)
+    return applied
+
+
+async def reconcile_players(db, identities, concurrency=RECONCILE_CONCURRENCY):
+    """Checks every tracked player and fixes the changed names and ids
+
+    Parameters:
+        db: Database: asynchronous access to the bot database
+        identities: IdentityCache: identities of the summoners
+        concurrency: int: maximum amount of the players checked at once
+
+    Returns:
+        list: (summoner_name, riot_id, player_id) of the changed players
+    """
+    players = await db.fetchall("SELECT player_id, riot_id, riot_region, summoner_name FROM players")
+
+    semaphore = asyncio.Semaphore(concurrency)
+    results = await asyncio.gather(*(check_player(identities, player, semaphore) for player in players),
+                                   return_exceptions=True)
+
+    changes = []
+    for (player_id, riot_id, _, summoner_name), summoner_data in zip(players, results):
+        if isinstance(summoner_data, Exception):
+            print(summoner_data)
+            continue
+        if summoner_data['name'] != summoner_name or summoner_data['id'] != riot_id:
+            changes.append((summoner_data['name'], summoner_data['id'], player_id))
+
+    if not changes:
+        return []
+
+    return await db.write(apply_changes, changes)
@@ -0,0 +1,91 @@
+"""
+Regions of the Riot API. Every command which turns the short name typed by
+the users into the platform id, shows the region of a summoner or links its
+op.gg profile reads this registry, so adding a region is a single line.
+"""
+import urllib.parse
+
+
+class Region:
+    """Single region of the Riot API
+
+    Parameters:
+        short_name: str: name typed by the users ex. eune
+        platform: str: platform id used by the Riot API ex. eun1
+        name: str: full name of the region
+        opgg: str: op.gg subdomain of the region
+        routing: str: regional routing value of the match-v5 endpoints
+    """
+    __slots__ = ('short_name', 'platform', 'name', 'opgg', 'routing')
+
+    def __init__(self, short_name, platform, name, opgg, routing):
+        self.short_name = short_name
+        self.platform = platform
+        self.name = name
+        self.opgg = opgg
+        self.routing = routing
+
+    @property
+    def label(self):
+        return self.short_name.upper()
+
+    def profile_url(self, summoner_name):
+        """Returns the op.gg profile of the summoner"""
+        return f'https://{self.opgg}.op.gg/summoner/userName={urllib.parse.quote(summoner_name)}'
+
+    def __repr__(self):
+        return self.label
+
+
+REGIONS = (
+    Region('eune', 'eun1', 'Europe North & East', 'eune', 'europe'),
+    Region('euw', 'euw1', 'Europe West', 'euw', 'europe'),
+    Region('ru', 'ru', 'Russia', 'ru', 'europe'),
+    Region('br', 'br1', 'Brazil', 'br', 'americas'),
+    Region('tr', 'tr1', 'Turkey', 'tr', 'europe'),
+    Region('oce', 'oc1', 'Oceania', 'oce', 'sea'),
+    Region('las', 'la2', 'Latin America South', 'las', 'americas'),
+    Region('lan', 'la1', 'Latin America North', 'lan', 'americas'),
+    Region('kr', 'kr', 'Korea', 'www', 'asia'),
+    Region('na', 'na1', 'North America', 'na', 'americas'),
+    Region('jp', 'jp1', 'Japan', 'jp', 'asia'),
+)
+
+BY_SHORT_NAME = {region.short_name: region for region in REGIONS}
+BY_PLATFORM = {region.platform: region for region in REGIONS}
+
+
+def find(name):
+    """Returns the region with given short name or platform id, None when
+    there is no such region"""
+    name = name.strip().lower()
+    return BY_SHORT_NAME.get(name) or BY_PLATFORM.get(name)
+
+
+def by_platform(platform):
+    """Returns the region of the platform id stored in the database. An id
+    missing from the registry still gets a region, so it can be shown"""
+    region = BY_PLATFORM.get(platform.lower())
+    if region is None:
+        region = Region(platform.lower(), platform.lower(), platform.upper(), 'www', 'americas')
+    return region
+
+
+def split_region(text, default):
+    """Splits the summoner name written as region:name, ex. euw:Faker.
+    Summoner names can't contain the colon, so the prefix is never a part of
+    the name.
+
+    Parameters:
+        text: str: summoner name with the optional region prefix
+        default: str: platform id used when there is no prefix
+
+    Returns:
+        tuple: platform id, None when the prefix is not a known region, and
+        the summoner name
+    """
+    if ':' not in text:
+        return default, text.strip()
+    prefix, summoner_name = text.split(':', 1)
+    region = find(prefix)
+    return (region.platform if region is not None else None), summoner_name.strip()
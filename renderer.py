@@ -0,0 +1,190 @@
+"""
+Rendering of the ranking lists into Discord embeds. Rows are built once per
+player, split into pages which fit into the embed limits and the pages of
+every leaderboard version are cached, so flipping pages doesn't render
+anything again.
+"""
+import asyncio
+from collections import OrderedDict
+
+import discord
+
+import regions
+
+# Discord limits the embed field value to 1024 characters
+FIELD_LIMIT = 1024
+FIELDS_PER_PAGE = 3
+
+PAGE_CACHE_SIZE = 500
+
+PREVIOUS_PAGE = '◀'
+NEXT_PAGE = '▶'
+
+MEDALS = {1: ' :first_place:', 2: ' :second_place:', 3: ' :third_place:'}
+
+
+def ranking_rows(entries, start=1):
+    """Returns the text row of every entry of the ranking. The region of
+    every summoner is shown when the ranking mixes many regions
+
+    Parameters:
+        entries: list: LadderEntry objects in the ranking order
+        start: int: position of the first entry
+
+    Returns:
+        list: rows of the ranking
+    """
+    rows = []
+    mixed_regions = len({entry.region for entry in entries}) > 1
+    for position, entry in enumerate(entries, start=start):
+        games = entry.wins + entry.losses
+        win_ratio = round((entry.wins * 100) / games) if games else 0
+        region = regions.by_platform(entry.region)
+        region_text = f' ({region.label})' if mixed_regions else ''
+        rows.append(f"{position}. [{entry.summoner_name}]({region.profile_url(entry.summoner_name)}){region_text}"
+                    f"{MEDALS.get(position, '')} **{entry.tier} {entry.rank}"
+                    f" {entry.league_points} LP** - {entry.wins}W {entry.losses}L"
+                    f" / Win Ratio {win_ratio}%\n\n")
+    return rows
+
+
+def player_rows(players):
+    """Returns the text row of every player of the ranking list with the
+    link to its op.gg profile
+
+    Parameters:
+        players: list: Player records of the ranking list
+
+    Returns:
+        list: rows of the list of players
+    """
+    rows = []
+    for position, player in enumerate(players, start=1):
+        region = regions.by_platform(player.region)
+        rows.append(f"{position}. Summoner name: [{player.summoner_name}]"
+                    f"({region.profile_url(player.summoner_name)}) - Region: **{region.label}**\n")
+    return rows
+
+
+def paginate(rows, field_limit=FIELD_LIMIT, fields_per_page=FIELDS_PER_PAGE):
+    """Splits the rows into pages of embed fields without breaking any row
+
+    Returns:
+        list: pages, every page is a list of field values
+    """
+    pages = []
+    fields = []
+    field = []
+    field_length = 0
+
+    for row in rows:
+        if field and field_length + len(row) > field_limit:
+            fields.append(''.join(field))
+            field = []
+            field_length = 0
+            if len(fields) == fields_per_page:
+                pages.append(fields)
+                fields = []
+        field.append(row[:field_limit])
+        field_length += len(row[:field_limit])
+
+    if field:
+        fields.append(''.join(field))
+    if fields:
+        pages.append(fields)
+    return pages
+
+
+class PageCache:
+    """Class responsible for keeping the rendered pages of the leaderboards,
+    keyed by the discord server, the queue and the leaderboard version
+
+    Parameters:
+        maxsize: int: maximum amount of the cached leaderboards
+    """
+    def __init__(self, maxsize=PAGE_CACHE_SIZE):
+        self.maxsize = maxsize
+        self._pages = OrderedDict()
+
+    def pages(self, key, entries_source):
+        """Returns the cached pages or renders them from the entries
+
+        Parameters:
+            key: tuple: (guild_id, queue, version) of the leaderboard
+            entries_source: callable: returns the entries to render
+
+        Returns:
+            list: pages of the leaderboard
+        """
+        pages = self._pages.get(key)
+        if pages is None:
+            pages = self._pages[key] = paginate(ranking_rows(entries_source()))
+            while len(self._pages) > self.maxsize:
+                self._pages.popitem(last=False)
+        self._pages.move_to_end(key)
+        return pages
+
+
+def build_embeds(pages, title, thumbnail=None, footer_text=None, timestamp=None):
+    """Returns one embed for every page"""
+    embeds = []
+    for page_number, fields in enumerate(pages, start=1):
+        if timestamp is not None:
+            embed = discord.Embed(title=title, color=0x0080FF, timestamp=timestamp)
+        else:
+            embed = discord.Embed(title=title, color=0x0080FF)
+        for value in fields:
+            embed.add_field(name='\u200b', value=value, inline=False)
+        if thumbnail:
+            embed.set_thumbnail(url=thumbnail)
+
+        page_text = f'Page {page_number}/{len(pages)}' if len(pages) > 1 else ''
+        text = ' | '.join(part for part in (page_text, footer_text) if part)
+        if text:
+            embed.set_footer(text=text)
+        embeds.append(embed)
+    return embeds
+
+
+async def send_paginated(ctx, embeds, timeout=120):
+    """Sends the first embed and flips the pages with the reactions of the
+    command author until the timeout. Adding and removing the reaction both
+    flip the page, so the bot doesn't need to manage the reactions of users.
+    Flipping runs in the background, so the command finishes once the first
+    page is sent.
+
+    Parameters:
+        ctx: object: Context of the command
+        embeds: list: embeds of every page
+        timeout: float: seconds of inactivity after which paging stops
+    """
+    message = await ctx.send(embed=embeds[0])
+    if len(embeds) > 1:
+        asyncio.ensure_future(_flip_pages(ctx, message, embeds, timeout))
+
+
+async def _flip_pages(ctx, message, embeds, timeout):
+    try:
+        await message.add_reaction(PREVIOUS_PAGE)
+        await message.add_reaction(NEXT_PAGE)
+    except discord.Forbidden:
+        return
+
+    def check(reaction, user):
+        return user == ctx.author and reaction.message.id == message.id and \
+            str(reaction.emoji) in (PREVIOUS_PAGE, NEXT_PAGE)
+
+    current_page = 0
+    while True:
+        add = asyncio.ensure_future(ctx.bot.wait_for('reaction_add', check=check))
+        remove = asyncio.ensure_future(ctx.bot.wait_for('reaction_remove', check=check))
+        done, pending = await asyncio.wait({add, remove}, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+        for task in pending:
+            task.cancel()
+        if not done:
+            return
+
+        reaction, _ = done.pop().result()
+        step = 1 if str(reaction.emoji) == NEXT_PAGE else -1
+        current_page = (current_page + step) % len(embeds)
+        await message.edit(embed=embeds[current_page])
@@ -0,0 +1,173 @@
+"""
+Asynchronous client for the Riot Games API. Every regional host gets its own
+keep-alive connection pool so the bot commands never block the event loop
+while waiting for the Riot servers.
+"""
+import asyncio
+import os
+import time
+import urllib.parse
+
+import aiohttp
+
+from cache import TTLCache
+from metrics import registry
+from rate_limit import PRIORITY_NAMES, RateLimitGovernor, request_priority
+
+# Host of the regional endpoints, RIOT_API_HOST points the bot at other
+# server ex. the local mock_riot.py
+RIOT_HOST = os.environ.get('RIOT_API_HOST', 'https://{region}.api.riotgames.com')
+
+# Seconds for which the downloaded data is reused by every discord server
+LEAGUE_ENTRIES_TTL = 60
+SUMMONER_TTL = 600
+CACHE_MAXSIZE = 10000
+
+RIOT_REQUESTS = registry.counter('kayn_riot_requests_total', 'Riot API responses by region, endpoint and status',
+                                 ('region', 'endpoint', 'status'))
+RIOT_LATENCY = registry.histogram('kayn_riot_request_seconds', 'Time of the Riot API requests',
+                                  ('region', 'endpoint'))
+RIOT_WAIT = registry.histogram('kayn_riot_rate_limit_wait_seconds', 'Time the requests waited for the rate limits',
+                               ('region', 'endpoint', 'priority'))
+
+
+class RiotApiError(Exception):
+    """Raised when the Riot API answers with anything else than 200 OK
+
+    Parameters:
+        status: int: HTTP status code returned by the Riot API
+        path: str: requested endpoint path
+    """
+    def __init__(self, status, path):
+        super().__init__(f'Riot API returned {status} for {path}')
+        self.status = status
+        self.path = path
+
+
+class RiotClient:
+    """Class responsible for talking with the Riot API. Sessions are created
+    lazily, one per region, and reused by every command.
+
+    Parameters:
+        api_key: str: Riot API key sent with every request
+        timeout: float: total time in seconds allowed for a single request
+        connections_per_region: int: size of the connection pool of a region
+        max_retries: int: how many times request answered with 429 is repeated
+        host: str: host of the regional endpoints with the {region} field
+        processes: int: amount of the bot processes sharing the API key
+    """
+    def __init__(self, api_key, timeout=10, connections_per_region=10, max_retries=3, host=RIOT_HOST,
+                 processes=1):
+        self.api_key = api_key
+        self.host = host
+        self.governor = RateLimitGovernor(processes=processes)
+        self._max_retries = max_retries
+        self._timeout = aiohttp.ClientTimeout(total=timeout)
+        self._connections_per_region = connections_per_region
+        self._sessions = {}
+        self.league_cache = TTLCache(LEAGUE_ENTRIES_TTL, CACHE_MAXSIZE)
+        self.summoner_cache = TTLCache(SUMMONER_TTL, CACHE_MAXSIZE)
+
+    def _session(self, region):
+        """Returns the pooled session of the given region, creating it on first
+        use"""
+        session = self._sessions.get(region)
+        if session is None or session.closed:
+            connector = aiohttp.TCPConnector(limit=self._connections_per_region,
+                                             keepalive_timeout=60, ttl_dns_cache=300)
+            session = aiohttp.ClientSession(connector=connector, timeout=self._timeout,
+                                            headers={'X-Riot-Token': self.api_key})
+            self._sessions[region] = session
+        return session
+
+    async def _get(self, region, family, path):
+        """Sends GET request to the regional host and returns decoded json.
+        The request waits for the rate limit governor and is repeated after
+        the Retry-After time when Riot answers 429
+
+        Parameters:
+            region: str: platform id of the region ex. eun1, or the regional
+            routing value of match-v5 ex. europe
+            family: str: endpoint family used for the method rate limit
+            path: str: endpoint path starting with a slash
+
+        Returns:
+            dict or list: decoded Riot API response
+        """
+        url = self.host.format(region=region) + path
+        priority = request_priority.get()
+        for _ in range(self._max_retries + 1):
+            started = time.perf_counter()
+            await self.governor.acquire(region, family, priority)
+            sent = time.perf_counter()
+            RIOT_WAIT.observe(sent - started, region, family, PRIORITY_NAMES[priority])
+            try:
+                response = await self._session(region).get(url)
+            except (aiohttp.ClientError, asyncio.TimeoutError):
+                RIOT_REQUESTS.inc(region, family, 'error')
+                raise
+            async with response:
+                RIOT_LATENCY.observe(time.perf_counter() - sent, region, family)
+                RIOT_REQUESTS.inc(region, family, str(response.status))
+                self.governor.update(region, family, response.headers)
+                if response.status == 429:
+                    retry_after = self.governor.back_off(region, family, response.headers)
+                    print(f'Rate limited on {region} {family}, retrying in {retry_after}s')
+                    continue
+                if response.status != 200:
+                    raise RiotApiError(response.status, path)
+                return await response.json()
+        raise RiotApiError(429, path)
+
+    async def summoner_by_name(self, region: str, summoner_name: str) -> dict:
+        """Returns summoner-v4 data of the summoner with given name"""
+        parsed_name = urllib.parse.quote(summoner_name)
+        return await self.summoner_cache.get_or_load(
+            (region, 'name', summoner_name.lower()),
+            lambda: self._get(region, 'summoner-v4', f'/lol/summoner/v4/summoners/by-name/{parsed_name}')
+        )
+
+    async def summoner_by_id(self, region: str, encrypted_summoner_id: str) -> dict:
+        """Returns summoner-v4 data of the summoner with given encrypted id"""
+        return await self.summoner_cache.get_or_load(
+            (region, 'id', encrypted_summoner_id),
+            lambda: self._get(region, 'summoner-v4', f'/lol/summoner/v4/summoners/{encrypted_summoner_id}')
+        )
+
+    async def match_ids(self, routing: str, puuid: str, start_time=None, count=100) -> list:
+        """Returns match-v5 ids of the matches of the player, newest first
+
+        Parameters:
+            routing: str: regional routing value ex. europe
+            puuid: str: puuid of the player
+            start_time: int: unix time, only the matches started since then
+            count: int: maximum amount of the ids, up to 100
+        """
+        query = {'count': count}
+        if start_time is not None:
+            query['startTime'] = int(start_time)
+        return await self._get(routing, 'match-v5-ids',
+                               f'/lol/match/v5/matches/by-puuid/{puuid}/ids?{urllib.parse.urlencode(query)}')
+
+    async def match(self, routing: str, match_id: str) -> dict:
+        """Returns match-v5 details of the match. Matches never change and
+        are large, so they are not cached"""
+        return await self._get(routing, 'match-v5', f'/lol/match/v5/matches/{match_id}')
+
+    async def league_entries(self, region: str, encrypted_summoner_id: str) -> list:
+        """Returns league-v4 ranked entries of the summoner with given
+        encrypted id"""
+        return await self.league_cache.get_or_load(
+            (region, encrypted_summoner_id),
+            lambda: self._get(region, 'league-v4', f'/lol/league/v4/entries/by-summoner/{encrypted_summoner_id}')
+        )
+
+    def cache_stats(self):
+        """Returns hit, miss and coalesce counters of the caches"""
+        return {'league-v4': self.league_cache.stats(), 'summoner-v4': self.summoner_cache.stats()}
+
+    async def close(self):
+        """Closes every regional session"""
+        for session in self._sessions.values():
+            await session.close()
+        self._sessions.clear()
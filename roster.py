@@ -0,0 +1,426 @@
+"""
+Ranking lists of the discord servers. Players are stored once in the players
+table and linked to the discord servers through guild_players, so duplicate
+checks and deletes are single indexed statements. Every function gets the
+connection from the Database and runs inside of its transaction.
+
+RosterStore keeps the lists in the memory, so the commands never read the
+whole list from the database. Every change is written to the database first
+and then applied to the memory.
+"""
+import sys
+
+from leaderboard import bump_ladder_versions, delete_entries
+
+
+def add_player(conn, guild_id, summoner_name, riot_id, region):
+    """Adds the summoner to the ranking list of the discord server. The name
+    of the summoner tracked by other discord server is left as it is, it's
+    only changed by the reconcile task
+
+    Parameters:
+        conn: sqlite3.Connection: connection to the bot database
+        guild_id: str: discord server id
+        summoner_name: str: current name of the summoner
+        riot_id: str: encrypted summoner id
+        region: str: platform id of the summoner region
+
+    Returns:
+        int: id of the added player, None when the summoner is already on
+        the list
+    """
+    conn.execute("""INSERT INTO players (riot_id, riot_region, summoner_name) VALUES (?, ?, ?)
+                 ON CONFLICT (riot_id, riot_region) DO NOTHING""",
+                 (riot_id, region, summoner_name))
+    cursor = conn.execute("""INSERT OR IGNORE INTO guild_players
+                          SELECT ?, player_id FROM players WHERE riot_id = ? AND riot_region = ?""",
+                          (guild_id, riot_id, region))
+    if cursor.rowcount != 1:
+        return None
+    return conn.execute("SELECT player_id FROM players WHERE riot_id = ? AND riot_region = ?",
+                        (riot_id, region)).fetchone()[0]
+
+
+def add_players(conn, guild_id, players):
+    """Adds many summoners to the ranking list of the discord server at once
+
+    Parameters:
+        conn: sqlite3.Connection: connection to the bot database
+        guild_id: str: discord server id
+        players: list: (summoner_name, riot_id, region) of every summoner
+
+    Returns:
+        dict: (riot_id, region) of the added summoners mapped to their player
+        ids, the summoners which were already on the list are left out
+    """
+    riot_ids = [riot_id for _, riot_id, _ in players]
+    already_added = set()
+    # SQLite limits the amount of the query parameters
+    for start in range(0, len(riot_ids), 500):
+        chunk = riot_ids[start:start + 500]
+        rows = conn.execute(f"""SELECT players.riot_id, players.riot_region FROM players JOIN guild_players
+                            ON guild_players.player_id = players.player_id AND guild_players.discord_server = ?
+                            WHERE players.riot_id IN ({','.join('?' * len(chunk))})""",
+                            [guild_id, *chunk]).fetchall()
+        already_added.update(rows)
+
+    conn.executemany("""INSERT INTO players (riot_id, riot_region, summoner_name) VALUES (?, ?, ?)
+                     ON CONFLICT (riot_id, riot_region) DO NOTHING""",
+                     [(riot_id, region, summoner_name) for summoner_name, riot_id, region in players])
+    new_players = {(riot_id, region) for _, riot_id, region in players if (riot_id, region) not in already_added}
+    conn.executemany("""INSERT OR IGNORE INTO guild_players
+                     SELECT ?, player_id FROM players WHERE riot_id = ? AND riot_region = ?""",
+                     [(guild_id, riot_id, region) for riot_id, region in new_players])
+
+    added = {}
+    for start in range(0, len(riot_ids), 500):
+        chunk = riot_ids[start:start + 500]
+        rows = conn.execute(f"""SELECT riot_id, riot_region, player_id FROM players
+                            WHERE riot_id IN ({','.join('?' * len(chunk))})""", chunk).fetchall()
+        added.update(((riot_id, region), player_id) for riot_id, region, player_id in rows
+                     if (riot_id, region) in new_players)
+    return added
+
+
+def delete_player(conn, guild_id, summoner_name, region=None):
+    """Deletes the summoner with given name (case insensitive) from the
+    ranking list of the discord server. Without the region the summoners of
+    that name from every region of the list are deleted
+
+    Returns:
+        list: ids of the deleted players, empty when there was no such
+        summoner on the list
+    """
+    if region is None:
+        # Only the list of the discord server is searched
+        rows = conn.execute("""SELECT players.player_id FROM guild_players CROSS JOIN players
+                            ON players.player_id = guild_players.player_id
+                            WHERE guild_players.discord_server = ? AND players.summoner_name = ? COLLATE NOCASE""",
+                            (guild_id, summoner_name)).fetchall()
+    else:
+        rows = conn.execute("""SELECT players.player_id FROM players JOIN guild_players
+                            ON guild_players.player_id = players.player_id AND guild_players.discord_server = ?
+                            WHERE players.riot_region = ? AND players.summoner_name = ? COLLATE NOCASE""",
+                            (guild_id, region, summoner_name)).fetchall()
+    return remove_players(conn, guild_id, [row[0] for row in rows])
+
+
+def remove_players(conn, guild_id, player_ids):
+    """Deletes the players with given ids from the ranking list of the
+    discord server. Players which aren't on any list anymore are deleted
+    together with their league entries
+
+    Returns:
+        list: ids of the players which were on the list
+    """
+    removed = []
+    for player_id in player_ids:
+        if conn.execute("DELETE FROM guild_players WHERE discord_server = ? AND player_id = ?",
+                        (guild_id, player_id)).rowcount:
+            removed.append(player_id)
+        orphan = conn.execute("""SELECT riot_region, riot_id FROM players WHERE player_id = ? AND NOT EXISTS (
+                              SELECT 1 FROM guild_players WHERE guild_players.player_id = players.player_id)""",
+                              (player_id,)).fetchone()
+        if orphan is not None:
+            conn.execute("DELETE FROM players WHERE player_id = ?", (player_id,))
+            delete_entries(conn, [orphan])
+            bump_ladder_versions(conn, orphan[0])
+    return removed
+
+
+def delete_guild_players(conn, guild_id):
+    """Deletes every summoner from the ranking list of the discord server,
+    the summoners which aren't on any list anymore are deleted together with
+    their league entries
+
+    Returns:
+        int: amount of the deleted summoners
+    """
+    orphans = conn.execute("""SELECT player_id, riot_region, riot_id FROM players WHERE player_id IN (
+                           SELECT player_id FROM guild_players WHERE discord_server = ?) AND NOT EXISTS (
+                           SELECT 1 FROM guild_players AS others WHERE others.player_id = players.player_id
+                           AND others.discord_server != ?)""", (guild_id, guild_id)).fetchall()
+    cursor = conn.execute("DELETE FROM guild_players WHERE discord_server = ?", (guild_id,))
+    if orphans:
+        conn.executemany("DELETE FROM players WHERE player_id = ?", [(player_id,) for player_id, _, _ in orphans])
+        delete_entries(conn, [(region, riot_id) for _, region, riot_id in orphans])
+        bump_ladder_versions(conn)
+    return cursor.rowcount
+
+
+def tracked_guilds(conn):
+    """Returns ids of the discord servers with at least one summoner"""
+    return [row[0] for row in conn.execute("SELECT DISTINCT discord_server FROM guild_players")]
+
+
+def load_roster(conn, owns=None):
+    """Returns every ranking list entry, ordered by the discord server and the
+    moment the player was added, and the players. Both tables are read in
+    their storage order, which is much faster than joining them in SQLite
+
+    Returns:
+        tuple: (discord_server, player_id) rows and (player_id, riot_id,
+        riot_region, summoner_name) rows
+    """
+    entries = conn.execute("SELECT discord_server, player_id FROM guild_players "
+                           "ORDER BY discord_server, player_id").fetchall()
+    if owns is not None:
+        entries = [entry for entry in entries if owns(entry[0])]
+    players = conn.execute("SELECT player_id, riot_id, riot_region, summoner_name FROM players").fetchall()
+    return entries, players
+
+
+def name_key(summoner_name):
+    """Returns the key of the name index. Most names are already lower case,
+    they share the string with the record instead of keeping a copy"""
+    key = summoner_name.casefold()
+    return summoner_name if key == summoner_name else key
+
+
+class Player:
+    """Tracked summoner kept in the memory
+
+    Parameters:
+        player_id: int: id of the players row
+        riot_id: str: encrypted summoner id
+        region: str: platform id of the summoner region
+        summoner_name: str: current name of the summoner
+    """
+    # No __dict__ and no weak references, a record is the object header and
+    # five pointers
+    __slots__ = ('player_id', 'riot_id', 'region', 'summoner_name', 'lists')
+
+    def __init__(self, player_id, riot_id, region, summoner_name):
+        self.player_id = player_id
+        self.riot_id = riot_id
+        self.region = sys.intern(region)
+        self.summoner_name = summoner_name
+        # Amount of the ranking lists the player is on
+        self.lists = 0
+
+    def __repr__(self):
+        return f'{self.summoner_name} ({self.region})'
+
+
+class RosterStore:
+    """Class responsible for keeping the ranking lists in the memory, indexed
+    by the discord server, by the region and encrypted id and by the lower
+    case name. Every player is a single record shared by all of the indexes
+    and the lists it's on. Lists are loaded once at the startup and every
+    change is written to the database first and then applied to the memory.
+
+    Parameters:
+        db: Database: asynchronous access to the bot database
+        owns: callable: tells if the discord server belongs to this process,
+        the lists of the other servers are not loaded
+    """
+    def __init__(self, db, owns=None):
+        self._db = db
+        self._owns = owns
+        self._guilds = {}
+        self._by_riot_id = {}
+        self._by_name = {}
+        self._changes = 0
+
+    def load(self, conn):
+        """Reads every ranking list of this process into the memory
+
+        Parameters:
+            conn: sqlite3.Connection: connection used during the startup
+        """
+        self._apply_rows(*load_roster(conn, self._owns))
+
+    async def reload(self):
+        """Reads the lists again, picking up the players renamed by the other
+        processes. Nothing is replaced when the lists changed in the meantime
+
+        Returns:
+            bool: False when the lists changed during the reload
+        """
+        changes = self._changes
+        entries, players = await self._db.read(load_roster, self._owns)
+        if changes != self._changes:
+            return False
+        self._apply_rows(entries, players)
+        return True
+
+    def _apply_rows(self, entries, players):
+        self._guilds = {}
+        self._by_riot_id = {}
+        self._by_name = {}
+        rows = {row[0]: row for row in players}
+        records = {}
+        for guild_id, player_id in entries:
+            player = records.get(player_id)
+            if player is None:
+                player = records[player_id] = self._remember(Player(*rows[player_id]))
+            self._link(guild_id, player)
+
+    def __len__(self):
+        return sum(len(players) for players in self._by_riot_id.values())
+
+    def entries(self):
+        """Returns the amount of the ranking list entries"""
+        return sum(len(players) for players in self._guilds.values())
+
+    def guilds(self):
+        """Returns ids of the discord servers with at least one player"""
+        return list(self._guilds)
+
+    def players(self, guild_id):
+        """Returns the players of the discord server list in the order they
+        were added"""
+        players = self._guilds.get(guild_id)
+        return list(players.values()) if players is not None else []
+
+    def get(self, region, riot_id):
+        players = self._by_riot_id.get(region)
+        return players.get(riot_id) if players is not None else None
+
+    def find(self, guild_id, summoner_name, region=None):
+        """Returns the players of the discord server list with given name,
+        compared without the letter case, from every region when the region
+        is not given"""
+        players = self._guilds.get(guild_id)
+        if players is None:
+            return []
+        namesakes = self._by_name.get(name_key(summoner_name), ())
+        if isinstance(namesakes, Player):
+            namesakes = (namesakes,)
+        return [player for player in namesakes
+                if player.player_id in players and (region is None or player.region == region)]
+
+    def _remember(self, player):
+        self._by_riot_id.setdefault(player.region, {})[player.riot_id] = player
+        # The name index keeps the record itself and a tuple only for the
+        # names shared by many summoners
+        key = name_key(player.summoner_name)
+        namesakes = self._by_name.get(key)
+        if namesakes is None:
+            self._by_name[key] = player
+        elif isinstance(namesakes, Player):
+            self._by_name[key] = (namesakes, player)
+        else:
+            self._by_name[key] = namesakes + (player,)
+        return player
+
+    def _forget(self, player):
+        self._by_riot_id[player.region].pop(player.riot_id, None)
+        key = name_key(player.summoner_name)
+        namesakes = self._by_name.get(key)
+        if namesakes is player:
+            del self._by_name[key]
+        elif isinstance(namesakes, tuple):
+            namesakes = tuple(namesake for namesake in namesakes if namesake is not player)
+            self._by_name[key] = namesakes[0] if len(namesakes) == 1 else namesakes
+
+    def _link(self, guild_id, player):
+        players = self._guilds.setdefault(guild_id, {})
+        if player.player_id not in players:
+            players[player.player_id] = player
+            player.lists += 1
+
+    def _unlink(self, guild_id, player_id):
+        players = self._guilds.get(guild_id)
+        player = players.pop(player_id, None) if players is not None else None
+        if player is None:
+            return
+        if not players:
+            del self._guilds[guild_id]
+        player.lists -= 1
+        if player.lists == 0:
+            self._forget(player)
+
+    def _upsert(self, player_id, riot_id, region, summoner_name):
+        """Returns the record of the player, None when the player is not in
+        the memory and player_id is not given. The name of the known player is
+        kept, the same way add_player keeps it"""
+        player = self.get(region, riot_id)
+        if player is None and player_id is not None:
+            player = self._remember(Player(player_id, riot_id, region, summoner_name))
+        return player
+
+    async def add(self, guild_id, summoner_name, riot_id, region):
+        """Adds the summoner to the ranking list, see add_player
+
+        Returns:
+            bool: False when the summoner is already on the list
+        """
+        player_id = await self._db.write(add_player, guild_id, summoner_name, riot_id, region)
+        self._changes += 1
+        player = self._upsert(player_id, riot_id, region, summoner_name)
+        if player_id is None:
+            return False
+        self._link(guild_id, player)
+        return True
+
+    async def add_many(self, guild_id, players):
+        """Adds many summoners to the ranking list at once, see add_players
+
+        Returns:
+            set: (riot_id, region) of the summoners which were already on the
+            list
+        """
+        added = await self._db.write(add_players, guild_id, players)
+        self._changes += 1
+        already_added = set()
+        for summoner_name, riot_id, region in players:
+            player_id = added.get((riot_id, region))
+            player = self._upsert(player_id, riot_id, region, summoner_name)
+            if player_id is None:
+                already_added.add((riot_id, region))
+            else:
+                self._link(guild_id, player)
+        return already_added
+
+    async def delete(self, guild_id, summoner_name, region=None):
+        """Deletes the players with given name from the ranking list, found in
+        the name index instead of the database
+
+        Returns:
+            list: deleted players
+        """
+        players = self.find(guild_id, summoner_name, region)
+        if not players:
+            return []
+        removed = set(await self._db.write(remove_players, guild_id, [player.player_id for player in players]))
+        self._changes += 1
+        for player in players:
+            self._unlink(guild_id, player.player_id)
+        return [player for player in players if player.player_id in removed]
+
+    async def delete_guild(self, guild_id):
+        """Deletes the whole ranking list of the discord server
+
+        Returns:
+            int: amount of the deleted summoners
+        """
+        deleted = await self._db.write(delete_guild_players, guild_id)
+        self.drop_guild(guild_id)
+        return deleted
+
+    def drop_guild(self, guild_id):
+        """Forgets the ranking list already deleted from the database"""
+        self._changes += 1
+        for player_id in list(self._guilds.get(guild_id, ())):
+            self._unlink(guild_id, player_id)
+
+    def rename(self, changes):
+        """Applies the names and ids already changed in the database
+
+        Parameters:
+            changes: list: (summoner_name, riot_id, player_id) of the players
+        """
+        if not changes:
+            return
+        self._changes += 1
+        by_player_id = {player.player_id: player for players in self._by_riot_id.values()
+                        for player in players.values()}
+        for summoner_name, riot_id, player_id in changes:
+            player = by_player_id.get(player_id)
+            if player is None:
+                continue
+            self._forget(player)
+            player.summoner_name = summoner_name
+            player.riot_id = riot_id
+            self._remember(player)
@@ -0,0 +1,80 @@
+"""
+Sharding of the bot over many processes. Discord assigns every discord server
+to one shard, so each process only refreshes the servers of its own shards,
+and the global background work runs in the process owning shard 0. Every
+process publishes the counters of its shards into shard_stats, which gives
+the owner commands the totals of the whole bot.
+"""
+import math
+import os
+import time
+
+# Seconds between the published counters and the age after which the shard
+# is reported as not responding
+SHARD_STATS_INTERVAL = 60
+SHARD_STATS_MAX_AGE = 180
+
+
+def config(environ=os.environ):
+    """Returns the shards of this process set by launcher.py, (None, None)
+    when the bot runs as a single process
+
+    Returns:
+        tuple: shard count and the list of shard ids
+    """
+    if 'SHARD_COUNT' not in environ:
+        return None, None
+    shard_count = int(environ['SHARD_COUNT'])
+    shard_ids = [int(shard_id) for shard_id in environ['SHARD_IDS'].split(',')]
+    return shard_count, shard_ids
+
+
+def process_count(environ=os.environ):
+    """Returns the amount of the bot processes started by launcher.py, they
+    all share the Riot API key and its rate limits"""
+    return int(environ.get('SHARD_PROCESSES', 1))
+
+
+def shard_of(guild_id, shard_count):
+    """Returns the shard Discord assigns the discord server to"""
+    return (int(guild_id) >> 22) % shard_count
+
+
+def store_shard_stats(conn, shard_count, shards):
+    """Stores the counters of the shards of this process
+
+    Parameters:
+        conn: sqlite3.Connection: connection of the Database writer
+        shard_count: int: amount of the shards of the whole bot
+        shards: list: (shard_id, guilds, latency) of every shard
+    """
+    now = int(time.time())
+    conn.executemany("""INSERT INTO shard_stats VALUES (?, ?, ?, ?, ?, ?)
+                     ON CONFLICT (shard_id) DO UPDATE SET shard_count = excluded.shard_count,
+                     guilds = excluded.guilds, latency = excluded.latency, pid = excluded.pid,
+                     updated_at = excluded.updated_at""",
+                     [(shard_id, shard_count, guilds, latency if math.isfinite(latency) else -1, os.getpid(), now)
+                      for shard_id, guilds, latency in shards])
+    # Shards of the previous, bigger deployment are not coming back
+    conn.execute("DELETE FROM shard_stats WHERE shard_id >= ?", (shard_count,))
+
+
+def read_shard_stats(conn):
+    """Returns the counters of every shard together with the totals of the
+    bot
+
+    Returns:
+        tuple: list of the shard rows and the dict of the totals
+    """
+    shards = conn.execute("""SELECT shard_id, guilds, latency, pid, updated_at FROM shard_stats
+                          ORDER BY shard_id""").fetchall()
+    players, entries = conn.execute("SELECT (SELECT COUNT(*) FROM players), "
+                                    "(SELECT COUNT(*) FROM guild_players)").fetchone()
+    now = time.time()
+    totals = {
+        'guilds': sum(row[1] for row in shards),
+        'players': players,
+        'ranking_list_entries': entries,
+        'stale_shards': [row[0] for row in shards if now - row[4] > SHARD_STATS_MAX_AGE],
+    }
+    return shards, totals
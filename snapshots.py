@@ -0,0 +1,118 @@
+"""
+Precomputed ranking snapshots. The background refresher downloads the league
+entries of every tracked summoner and keeps them per discord server and queue,
+so the ranking command can answer without waiting for the Riot API.
+"""
+import asyncio
+import time
+
+from leaderboard import LadderEntry, Leaderboard
+
+QUEUE_TYPES = {'solo': 'RANKED_SOLO_5x5', 'flex': 'RANKED_FLEX_SR'}
+
+
+class Snapshot:
+    """Ranked entries of a single discord server taken at the same moment
+
+    Parameters:
+        taken_at: float: unix time of the snapshot
+        queues: dict: queue name mapped to the list of LadderEntry
+        failed: list: names of the summoners which couldn't be downloaded
+        players: int: amount of the summoners the snapshot was made for
+        failed_ids: set: encrypted ids of the failed summoners
+        downloaded: list: (region, riot_id) of the summoners whose entries
+        were downloaded, including the unranked ones
+    """
+    def __init__(self, taken_at, queues, failed, players, failed_ids=(), downloaded=()):
+        self.taken_at = taken_at
+        self.queues = queues
+        self.failed = failed
+        self.players = players
+        self.failed_ids = set(failed_ids)
+        self.downloaded = downloaded
+
+    @property
+    def age(self):
+        return time.time() - self.taken_at
+
+
+class SnapshotStore:
+    """Class responsible for keeping the latest snapshot of every discord
+    server together with the leaderboards of its queues. Leaderboards outlive
+    the dropped snapshots, so the next snapshot only updates changed entries.
+
+    Parameters:
+        max_age: float: seconds after which the snapshot is too old to be used
+    """
+    def __init__(self, max_age):
+        self.max_age = max_age
+        self._snapshots = {}
+        self._leaderboards = {}
+
+    def get(self, guild_id):
+        return self._snapshots.get(guild_id)
+
+    def fresh(self, guild_id):
+        """Returns the snapshot of the discord server or None when it's missing
+        or older than max_age"""
+        snapshot = self._snapshots.get(guild_id)
+        if snapshot is None or snapshot.age > self.max_age:
+            return None
+        return snapshot
+
+    def put(self, guild_id, snapshot):
+        self._snapshots[guild_id] = snapshot
+        for queue, entries in snapshot.queues.items():
+            self.leaderboard(guild_id, queue).replace_all(entries, keep=snapshot.failed_ids)
+
+    def remove(self, guild_id):
+        """Drops the snapshot so the next ranking downloads fresh data"""
+        self._snapshots.pop(guild_id, None)
+
+    def forget(self, guild_id):
+        """Drops the snapshot and the leaderboards of the discord server"""
+        self._snapshots.pop(guild_id, None)
+        for queue in QUEUE_TYPES:
+            self._leaderboards.pop((guild_id, queue), None)
+
+    def leaderboard(self, guild_id, queue):
+        """Returns the leaderboard of the queue of the discord server"""
+        board = self._leaderboards.get((guild_id, queue))
+        if board is None:
+            board = self._leaderboards[(guild_id, queue)] = Leaderboard()
+        return board
+
+
+async def build_snapshot(players, fetch):
+    """Downloads the ranked entries of every summoner and groups them by queue.
+    A summoner which couldn't be downloaded is only reported as failed.
+
+    Parameters:
+        players: list: Player records of the ranking list
+        fetch: callable: coroutine function returning league entries of a
+        player
+
+    Returns:
+        Snapshot: grouped ranked entries
+    """
+    results = await asyncio.gather(*(fetch(player) for player in players), return_exceptions=True)
+
+    queues = {queue: [] for queue in QUEUE_TYPES}
+    failed = []
+    failed_ids = []
+    downloaded = []
+
+    for player, player_ranked_data in zip(players, results):
+        if isinstance(player_ranked_data, Exception):
+            print(player_ranked_data)
+            failed.append(player.summoner_name)
+            failed_ids.append(player.riot_id)
+            continue
+
+        downloaded.append((player.region, player.riot_id))
+        for entry in player_ranked_data:
+            for queue, queue_type in QUEUE_TYPES.items():
+                if entry['queueType'] == queue_type:
+                    queues[queue].append(LadderEntry.from_league_entry(player.summoner_name, entry, player.region))
+
+    return Snapshot(time.time(), queues, failed, len(players), failed_ids, downloaded)